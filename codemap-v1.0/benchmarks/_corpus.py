@@ -0,0 +1,60 @@
+"""Shared helpers for the token benchmarks: a synthetic source tree and tokenizer setup."""
+import atexit, os, random, shutil, sys, tempfile, threading, time
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+sys.path.insert(0, ROOT)
+
+from config.tokenizers import set_tokenizer
+
+_WORDS = [
+    "def", "return", "self", "value", "index", "count", "path", "None", "if", "for", "in", "import",
+    "class", "result", "=", "+", "(", ")", ":", ",", "[]", "{}", "0", "1", "42", "'text'", "# note",
+
+]
+
+def make_corpus(files: int, size: int, seed: int = 26) -> List[str]:
+    """Write `files` Python-like sources averaging `size` bytes into a temp dir and return their paths."""
+    rng = random.Random(seed)
+    root = tempfile.mkdtemp(prefix="cm_bench_")
+    atexit.register(shutil.rmtree, root, True)
+    paths = []
+    for i in range(files):
+        d = os.path.join(root, f"pkg{i % 40}")
+        os.makedirs(d, exist_ok=True)
+        target = rng.randint(size // 2, size * 3 // 2)
+        lines, n = [], 0
+        while n < target:
+            line = "    " * rng.randrange(4) + " ".join(rng.choice(_WORDS) for _ in range(rng.randrange(2, 12)))
+            lines.append(line)
+            n += len(line) + 1
+        path = os.path.join(d, f"mod{i}.py")
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+def load_tokenizer(name: str, encoding: str | None):
+    tok = set_tokenizer(name, encoding)
+    try:
+        getattr(tok, "full", tok).warm()
+    except Exception as e:
+        sys.exit(f"tokenizer {name!r} could not load: {e}")
+    return tok
+
+def count_with(manager, paths: List[str]) -> float:
+    """Queue every path on `manager` and return the seconds until the last callback."""
+    left = [len(paths)]
+    lock = threading.Lock()
+    done = threading.Event()
+    def cb(_path, _res):
+        with lock:
+            left[0] -= 1
+            if left[0] == 0:
+                done.set()
+    t0 = time.perf_counter()
+    for p in paths:
+        manager.queue_token_count(p, cb, force_update=True)
+    done.wait()
+    return time.perf_counter() - t0
@@ -0,0 +1,51 @@
+"""Time the paste parser on 5,000-segment bundles in every fenced preset.
+
+    python benchmarks/bench_paste_parse.py [--segments N] [--repeat R]
+
+Reports the best of R runs for parsing alone and for parsing plus reading every body.
+"""
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.constants import COPY_FORMAT_PRESETS
+from core.refactor.language import determine_language
+from core.utils import clipboard
+
+FORMATS = ("optimized", "compact", "dash", "blocks")
+
+def _files(n: int):
+    return [(f"src/pkg{i % 50}/mod{i}.py", f"def f{i}():\n\n    return {i}") for i in range(n)]
+
+def _bundle(files, fmt: str, eol: str = "\n") -> str:
+    t = COPY_FORMAT_PRESETS[fmt]
+    buf = "\n".join(t.format(path=p, content=c, language=determine_language(p)) for p, c in files)
+    return buf.replace("\n", eol)
+
+def _best(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        clipboard._norm.cache_clear()
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--segments", type=int, default=5000)
+    ap.add_argument("--repeat", type=int, default=50)
+    args = ap.parse_args()
+    files = _files(args.segments)
+    cases = [(fmt, _bundle(files, fmt)) for fmt in FORMATS]
+    cases += [(f"{fmt} crlf", _bundle(files, fmt, "\r\n")) for fmt in FORMATS]
+    cases.append(("unclosed", "".join(f"{p}\n```python\n{c}\n" for p, c in files)))
+    print(f"{'input':16}{'segments':>10}{'parse ms':>10}{'+bodies ms':>12}{'seg/s':>12}")
+    for name, buf in cases:
+        segs = list(clipboard.iter_segments(buf))
+        parse = _best(lambda: list(clipboard.iter_segments(buf)), args.repeat)
+        full = _best(lambda: [s.body for s in clipboard.iter_segments(buf)], args.repeat)
+        print(f"{name:16}{len(segs):>10}{parse:>10.1f}{full:>12.1f}{len(segs) / parse * 1000.0:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Compare token-count throughput (files/sec) of per-file, batched and managed counting.
+
+    python benchmarks/bench_token_throughput.py [--files N] [--size BYTES] [--repeat R]
+
+per-file   reads each file and calls count_tokens once per file (the old worker path)
+batched    reads the files and calls count_tokens_batch on _BATCH_FILES-sized groups
+manager    queues every file on a fresh TokenCountManager with the thread engine
+"""
+import argparse, time
+
+from _corpus import count_with, load_tokenizer, make_corpus
+
+from config.constants import count_tokens, count_tokens_batch
+from core.operations.tokens import _BATCH_FILES, TokenCountManager
+
+def _read(path: str) -> str:
+    with open(path, "rb") as f:
+        return f.read().decode("utf-8", "ignore")
+
+def per_file(paths):
+    for p in paths:
+        count_tokens(_read(p))
+
+def batched(paths, threads: int):
+    for i in range(0, len(paths), _BATCH_FILES):
+        count_tokens_batch([_read(p) for p in paths[i:i + _BATCH_FILES]], threads)
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--files", type=int, default=5000)
+    ap.add_argument("--size", type=int, default=2000, help="average file size in bytes")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--tokenizer", default="tiktoken")
+    ap.add_argument("--encoding", default=None)
+    args = ap.parse_args()
+    load_tokenizer(args.tokenizer, args.encoding)
+    paths = make_corpus(args.files, args.size)
+    manager = TokenCountManager(engine="thread")
+    runs = {
+        "per-file": lambda: per_file(paths),
+        "batched": lambda: batched(paths, manager._threads),
+        "manager": lambda: count_with(TokenCountManager(engine="thread"), paths),
+    }
+    print(f"{len(paths)} files, ~{args.size} bytes each, tokenizer {args.tokenizer}")
+    print(f"{'path':10}{'best s':>10}{'files/s':>12}")
+    for name, fn in runs.items():
+        best = float("inf")
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"{name:10}{best:>10.3f}{len(paths) / best:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Show how the initial token count scales with worker count for the thread and process engines.
+
+    python benchmarks/bench_token_workers.py [--files N] [--size BYTES] [--workers 1,2,4,8]
+
+Each run counts the whole corpus on a fresh TokenCountManager with a cold cache.
+Process timings include starting the pool and loading the encoding in every worker.
+"""
+import argparse, os
+
+from _corpus import count_with, load_tokenizer, make_corpus
+
+from core.operations.tokens import TokenCountManager
+
+def main():
+    cpus = os.cpu_count() or 1
+    default = ",".join(str(w) for w in (1, 2, 4, 8, 16, 32, 64) if w <= cpus) or "1"
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--files", type=int, default=20000)
+    ap.add_argument("--size", type=int, default=2000, help="average file size in bytes")
+    ap.add_argument("--workers", default=default, help="comma-separated worker counts")
+    ap.add_argument("--engines", default="thread,process")
+    ap.add_argument("--tokenizer", default="tiktoken")
+    ap.add_argument("--encoding", default=None)
+    args = ap.parse_args()
+    load_tokenizer(args.tokenizer, args.encoding)
+    paths = make_corpus(args.files, args.size)
+    print(f"{len(paths)} files, ~{args.size} bytes each, {cpus} CPU(s), tokenizer {args.tokenizer}")
+    print(f"{'engine':9}{'workers':>8}{'seconds':>10}{'files/s':>12}{'speedup':>9}")
+    for engine in args.engines.split(","):
+        base = None
+        for w in (int(x) for x in args.workers.split(",")):
+            manager = TokenCountManager(max_workers=w, engine=engine, processes=w)
+            try:
+                secs = count_with(manager, paths)
+            finally:
+                manager.stop()
+            base = base or secs
+            print(f"{engine:9}{w:>8}{secs:>10.2f}{len(paths) / secs:>12.0f}{base / secs:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
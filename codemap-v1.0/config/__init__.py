@@ -1,5 +1,6 @@
 from config.constants import (
     STATE_FILE,
+    TOKEN_CACHE_FILE,
     SNAPSHOT_DIR,
     SUCCESS_MESSAGE_DURATION,
     IGNORED_PATTERNS,
@@ -7,8 +8,6 @@ from config.constants import (
     COPY_FORMAT_PRESETS,
     SCROLL_SPEED,
     MAX_TREE_DEPTH,
-    INPUT_TIMEOUT,
-    CLI_REFRESH_INTERVAL,
     count_tokens,
     CLEANUP_PATTERNS,
     CLEANUP_OPTIONS,
@@ -46,8 +45,15 @@ from config.symbols import (
 
 )
 
+def __getattr__(name: str):
+    if name in ("INPUT_TIMEOUT", "CLI_REFRESH_INTERVAL"):
+        import config.constants
+        return getattr(config.constants, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     "STATE_FILE",
+    "TOKEN_CACHE_FILE",
     "SNAPSHOT_DIR",
     "SUCCESS_MESSAGE_DURATION",
     "IGNORED_PATTERNS",
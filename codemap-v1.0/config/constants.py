@@ -1,11 +1,15 @@
 import os
 import sys
 import functools
-import tiktoken
+import threading
 import subprocess
 import re
+import json
+import tempfile
 from pathlib import Path
 import logging
+from typing import List
+from config.tokenizers import get_tokenizer
 
 @functools.lru_cache(maxsize=1)
 def _detect_refresh_rate() -> float:
@@ -19,9 +23,13 @@ def _detect_refresh_rate() -> float:
             user32.ReleaseDC(0, hdc)
             return float(hz)
         if sys.platform.startswith("darwin"):
+            if os.getenv("SSH_CONNECTION"):
+                return 0.0
             out = subprocess.check_output(["system_profiler", "SPDisplaysDataType"], timeout=2, text=True, errors='ignore')
             m = re.search(r"Refresh Rate:\s*(\d+)", out)
             return float(m.group(1)) if m else 0.0
+        if not os.getenv("DISPLAY"):
+            return 0.0
         out = subprocess.check_output(["xrandr", "--current"], timeout=1, text=True, errors='ignore')
         current_mode_line = re.search(r"^\s*.*?\s*\d+x\d+.*?\*.*$", out, re.MULTILINE)
         if current_mode_line:
@@ -45,18 +53,83 @@ def _env_rate() -> float:
         logging.warning("Invalid value for CM_REFRESH_HZ environment variable. Must be a float.")
         return 0.0
 
-@functools.lru_cache(maxsize=1)
-def get_refresh_rate() -> float:
+def _rate_context() -> dict:
+    return {
+        "platform": sys.platform,
+        "display": os.getenv("DISPLAY", ""),
+        "wayland": os.getenv("WAYLAND_DISPLAY", ""),
+        "term": os.getenv("TERM", ""),
+        "ssh": bool(os.getenv("SSH_CONNECTION")),
+    }
+
+def _load_cached_rate() -> float | None:
+    try:
+        with open(REFRESH_RATE_FILE, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("context") == _rate_context():
+            return float(data.get("hz", 0.0))
+    except (OSError, ValueError, TypeError, AttributeError):
+        pass
+    return None
+
+def _store_rate(hz: float) -> None:
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=CONFIG_DIR, encoding="utf-8") as tmp:
+            json.dump({"hz": hz, "context": _rate_context()}, tmp)
+            tmp_path = tmp.name
+        os.replace(tmp_path, REFRESH_RATE_FILE)
+    except OSError as e:
+        logging.warning(f"Could not cache refresh rate: {e}")
+
+_FALLBACK_HZ = 144.0
+
+_rate = 0.0
+
+_probe_done = threading.Event()
+
+_probe_started = False
+
+_probe_lock = threading.Lock()
+
+def get_refresh_rate(wait: bool = True) -> float:
+    global _rate
+    if _rate > 0:
+        return _rate
     env_val = _env_rate()
     if env_val > 0:
-        return env_val
-    detected_val = _detect_refresh_rate()
-    if detected_val > 0:
-        return detected_val
-    return 144.0
-
-def get_cli_refresh_interval() -> float:
-    rate = get_refresh_rate()
+        _rate = env_val
+        return _rate
+    cached = _load_cached_rate()
+    start_refresh_probe()
+    if cached is not None:
+        _rate = _rate or cached or _FALLBACK_HZ
+        return _rate
+    if wait:
+        _probe_done.wait(3.0)
+    return _rate or _FALLBACK_HZ
+
+def _probe() -> None:
+    global _rate
+    try:
+        if _env_rate() > 0:
+            return
+        hz = _detect_refresh_rate()
+        _store_rate(hz)
+        _rate = hz if hz > 0 else _rate or _FALLBACK_HZ
+    finally:
+        _probe_done.set()
+
+def start_refresh_probe() -> None:
+    global _probe_started
+    with _probe_lock:
+        if _probe_started:
+            return
+        _probe_started = True
+    threading.Thread(target=_probe, daemon=True, name="cm_refresh_probe").start()
+
+def get_cli_refresh_interval(wait: bool = True) -> float:
+    rate = get_refresh_rate(wait)
     effective_rate = min(120.0, max(1.0, rate))
     return 1.0 / effective_rate
 
@@ -70,22 +143,18 @@ else:
     _data_base = Path(os.getenv("XDG_DATA_HOME", Path.home() / ".local" / "share")) / "CodeMap"
     _state_base = Path(os.getenv("XDG_STATE_HOME", Path.home() / ".local" / "state")) / "CodeMap"
 
-os.makedirs(_config_base, exist_ok=True)
-
-os.makedirs(_data_base, exist_ok=True)
+CONFIG_DIR = str(_config_base)
 
-os.makedirs(_state_base, exist_ok=True)
+REFRESH_RATE_FILE = str(_config_base / "refresh_rate.json")
 
 STATE_FILE = str(_state_base / "__tree_state__")
 
-SNAPSHOT_DIR = str(_data_base / "snapshots")
+TOKEN_CACHE_FILE = str(_state_base / "token_cache.json")
 
-os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+SNAPSHOT_DIR = str(_data_base / "snapshots")
 
 SUCCESS_MESSAGE_DURATION = 1.0
 
-CLI_REFRESH_INTERVAL = get_cli_refresh_interval()
-
 IGNORED_PATTERNS = [
     "__pycache__", "node_modules", "dist", "build", "venv", ".git", ".svn", ".hg",
     ".idea", ".vscode", ".env*", ".DS_Store", "Thumbs.db", "*.bak", "*.tmp",
@@ -122,8 +191,6 @@ SCROLL_SPEED = {"normal": 1, "accelerated": 5}
 
 MAX_TREE_DEPTH = 15
 
-INPUT_TIMEOUT = max(0.01, CLI_REFRESH_INTERVAL)
-
 CLEANUP_PATTERNS = [
     "__pycache__", "*.pyc", "*.pyo", "*.pyd", ".coverage", ".pytest_cache",
     ".hypothesis", "*.so", "*.o", "*.obj", "*.class", "target/", "build/", "dist/",
@@ -133,19 +200,35 @@ CLEANUP_PATTERNS = [
 
 CLEANUP_OPTIONS = {"enabled": True, "recursive": True, "follow_symlinks": False, "delete_empty_dirs": True}
 
-ENCODING = tiktoken.encoding_for_model("gpt-4o")
-
 def count_tokens(content: str) -> int:
     try:
-        return len(ENCODING.encode(content))
+        return get_tokenizer().count(content)
     except Exception as e:
         logging.error(f"Error during token counting: {e}", exc_info=True)
         return len(content) // 4
 
+def count_tokens_batch(contents: List[str], num_threads: int = 8) -> List[int]:
+    try:
+        return get_tokenizer().count_batch(contents, num_threads)
+    except Exception as e:
+        logging.error(f"Error during batch token counting: {e}", exc_info=True)
+        return [len(c) // 4 for c in contents]
+
+def __getattr__(name: str):
+    if name == "ENCODING":
+        t = get_tokenizer()
+        return getattr(t, "full", t).encoding()
+    if name == "CLI_REFRESH_INTERVAL":
+        return get_cli_refresh_interval(wait=False)
+    if name == "INPUT_TIMEOUT":
+        return max(0.01, get_cli_refresh_interval(wait=False))
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     "STATE_FILE", "SNAPSHOT_DIR", "SUCCESS_MESSAGE_DURATION", "CLI_REFRESH_INTERVAL",
     "IGNORED_PATTERNS", "ALLOWED_EXTENSIONS", "COPY_FORMAT_PRESETS", "SCROLL_SPEED",
-    "MAX_TREE_DEPTH", "INPUT_TIMEOUT", "count_tokens", "CLEANUP_PATTERNS",
-    "CLEANUP_OPTIONS", "get_refresh_rate", "get_cli_refresh_interval", "ENCODING"
+    "MAX_TREE_DEPTH", "INPUT_TIMEOUT", "count_tokens", "count_tokens_batch", "CLEANUP_PATTERNS",
+    "CLEANUP_OPTIONS", "get_refresh_rate", "get_cli_refresh_interval", "start_refresh_probe", "ENCODING", "CONFIG_DIR",
+    "TOKEN_CACHE_FILE"
 
 ]
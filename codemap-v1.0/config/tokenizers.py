@@ -0,0 +1,149 @@
+import os
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_ENCODING = "gpt-4o"
+
+class HeuristicTokenizer:
+    name = "heuristic"
+    exact = False
+
+    def count(self, text: str) -> int:
+        return (len(text) + 3) // 4
+
+    def count_batch(self, texts: List[str], num_threads: int = 8) -> List[int]:
+        return [(len(t) + 3) // 4 for t in texts]
+
+    def warm(self) -> None:
+        pass
+
+class TiktokenTokenizer:
+    name = "tiktoken"
+    exact = True
+
+    def __init__(self, encoding: Optional[str] = None):
+        self.encoding_name = encoding or DEFAULT_ENCODING
+        self._enc = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._enc is not None
+
+    def encoding(self):
+        if self._enc is None:
+            with self._lock:
+                if self._enc is None:
+                    import tiktoken
+                    try:
+                        self._enc = tiktoken.get_encoding(self.encoding_name)
+                    except ValueError:
+                        self._enc = tiktoken.encoding_for_model(self.encoding_name)
+        return self._enc
+
+    def count(self, text: str) -> int:
+        return len(self.encoding().encode_ordinary(text))
+
+    def count_batch(self, texts: List[str], num_threads: int = 8) -> List[int]:
+        return [len(t) for t in self.encoding().encode_ordinary_batch(texts, num_threads=num_threads)]
+
+    def warm(self) -> None:
+        self.encoding()
+
+class AutoTokenizer:
+    name = "auto"
+
+    def __init__(self, encoding: Optional[str] = None):
+        self.fast = HeuristicTokenizer()
+        self.full = TiktokenTokenizer(encoding)
+        self.encoding_name = self.full.encoding_name
+        self._warming = False
+        self._lock = threading.Lock()
+
+    @property
+    def exact(self) -> bool:
+        return self.full.loaded
+
+    def _load(self) -> None:
+        try:
+            self.full.warm()
+        except Exception as e:
+            logging.error(f"Could not load encoding {self.encoding_name}: {e}")
+            return
+        for cb in list(_ready_callbacks):
+            try:
+                cb()
+            except Exception as e:
+                logging.error(f"Tokenizer ready callback failed: {e}", exc_info=True)
+
+    def warm(self) -> None:
+        with self._lock:
+            if self._warming:
+                return
+            self._warming = True
+        threading.Thread(target=self._load, daemon=True, name="tok_load").start()
+
+    def count(self, text: str) -> int:
+        if self.full.loaded:
+            return self.full.count(text)
+        self.warm()
+        return self.fast.count(text)
+
+    def count_batch(self, texts: List[str], num_threads: int = 8) -> List[int]:
+        if self.full.loaded:
+            return self.full.count_batch(texts, num_threads)
+        self.warm()
+        return self.fast.count_batch(texts, num_threads)
+
+_BACKENDS: Dict[str, Callable[[Optional[str]], object]] = {
+    "auto": AutoTokenizer,
+    "tiktoken": TiktokenTokenizer,
+    "heuristic": lambda _encoding=None: HeuristicTokenizer(),
+
+}
+
+_ready_callbacks: List[Callable[[], None]] = []
+
+_active = None
+
+_active_lock = threading.RLock()
+
+def register_tokenizer(name: str, factory: Callable[[Optional[str]], object]) -> None:
+    _BACKENDS[name] = factory
+
+def tokenizer_names() -> List[str]:
+    return list(_BACKENDS)
+
+def on_tokenizer_ready(cb: Callable[[], None]) -> None:
+    _ready_callbacks.append(cb)
+
+def set_tokenizer(name: Optional[str] = None, encoding: Optional[str] = None):
+    global _active
+    name = name or os.getenv("CM_TOKENIZER", "auto")
+    encoding = encoding or os.getenv("CM_ENCODING") or None
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        logging.warning(f"Unknown tokenizer backend '{name}'. Falling back to auto.")
+        name, factory = "auto", _BACKENDS["auto"]
+    with _active_lock:
+        _active = factory(encoding)
+    return _active
+
+def get_tokenizer():
+    if _active is None:
+        with _active_lock:
+            if _active is None:
+                set_tokenizer()
+    return _active
+
+def tokenizer_spec() -> tuple:
+    t = get_tokenizer()
+    return t.name, getattr(t, "encoding_name", None)
+
+__all__ = [
+    "DEFAULT_ENCODING", "HeuristicTokenizer", "TiktokenTokenizer", "AutoTokenizer",
+    "register_tokenizer", "tokenizer_names", "on_tokenizer_ready", "set_tokenizer",
+    "get_tokenizer", "tokenizer_spec",
+
+]
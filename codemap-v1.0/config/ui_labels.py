@@ -1,6 +1,6 @@
-KEY_BINDINGS={"copy":"c","paste":"p","save":"b","load":"v","toggle":"e","toggle_all":"E","enable":"d","disable":"d","refactor":"r","refactor_all":"R"}
+KEY_BINDINGS={"copy":"c","paste":"p","save":"b","load":"v","toggle":"e","toggle_all":"E","enable":"d","disable":"d","refactor":"r","refactor_all":"R","cancel":"x"}
 
-LABEL_NAMES={"copy":"Copy","paste":"Paste","save":"Save","load":"Load","toggle":"Toggle","toggle_all":"Toggle All","enable":"Enable","disable":"Disable","refactor":"Refactor","refactor_all":"Refactor All"}
+LABEL_NAMES={"copy":"Copy","paste":"Paste","save":"Save","load":"Load","toggle":"Toggle","toggle_all":"Toggle All","enable":"Enable","disable":"Disable","refactor":"Refactor","refactor_all":"Refactor All","cancel":"Cancel"}
 
 def _make(n):
     k=KEY_BINDINGS[n]
@@ -28,16 +28,20 @@ REFACTOR_LABEL=_make("refactor")
 
 REFACTOR_ALL_LABEL=_make("refactor_all")
 
+CANCEL_LABEL=_make("cancel")
+
 NO_FILES_LABEL="No files to display."
 
 NO_TOKENS_LABEL="No tokens to copy."
 
 SUCCESS_MESSAGE="Successfully Copied to Clipboard"
 
+CHUNK_SUCCESS_MESSAGE="Copied part {part}/{parts} to Clipboard"
+
 REFACTOR_SUCCESS_MESSAGE="File refactored successfully."
 
 REFACTOR_ALL_SUCCESS_MESSAGE="All included files refactored successfully."
 
 SEPARATOR="·"
 
-__all__=["TOKEN_LABEL","COPY_LABEL","PASTE_LABEL","SAVE_LABEL","LOAD_LABEL","TOGGLE_LABEL","TOGGLE_ALL_LABEL","ENABLE_LABEL","DISABLE_LABEL","REFACTOR_LABEL","REFACTOR_ALL_LABEL","NO_FILES_LABEL","NO_TOKENS_LABEL","SUCCESS_MESSAGE","REFACTOR_SUCCESS_MESSAGE","REFACTOR_ALL_SUCCESS_MESSAGE","SEPARATOR","KEY_BINDINGS","LABEL_NAMES"]
+__all__=["TOKEN_LABEL","COPY_LABEL","PASTE_LABEL","SAVE_LABEL","LOAD_LABEL","TOGGLE_LABEL","TOGGLE_ALL_LABEL","ENABLE_LABEL","DISABLE_LABEL","REFACTOR_LABEL","REFACTOR_ALL_LABEL","CANCEL_LABEL","NO_FILES_LABEL","NO_TOKENS_LABEL","SUCCESS_MESSAGE","CHUNK_SUCCESS_MESSAGE","REFACTOR_SUCCESS_MESSAGE","REFACTOR_ALL_SUCCESS_MESSAGE","SEPARATOR","KEY_BINDINGS","LABEL_NAMES"]
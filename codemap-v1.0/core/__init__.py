@@ -1,6 +1,17 @@
-from core.utils.clipboard import copy_text_to_clipboard,copy_files_subloop,has_valid_paste,paste_into,get_clipboard_segments,trim_caches
-from core.utils.state import load_state,save_state,apply_state,gather_state
-from core.utils.caching import LRUCache
-from core.utils.snapshot import save_snapshot,load_snapshot,delete_snapshot,has_snapshot
+import importlib
 
-__all__=["copy_text_to_clipboard","copy_files_subloop","has_valid_paste","paste_into","get_clipboard_segments","trim_caches","load_state","save_state","apply_state","gather_state","LRUCache","save_snapshot","load_snapshot","delete_snapshot","has_snapshot"]
+_EXPORTS={
+    "copy_text_to_clipboard":"core.utils.clipboard","copy_files_subloop":"core.utils.clipboard","has_valid_paste":"core.utils.clipboard",
+    "paste_into":"core.utils.clipboard","get_clipboard_segments":"core.utils.clipboard","trim_caches":"core.utils.clipboard",
+    "load_state":"core.utils.state","save_state":"core.utils.state","apply_state":"core.utils.state","gather_state":"core.utils.state",
+    "LRUCache":"core.utils.caching","save_snapshot":"core.utils.snapshot","load_snapshot":"core.utils.snapshot",
+    "delete_snapshot":"core.utils.snapshot","has_snapshot":"core.utils.snapshot",
+
+}
+
+def __getattr__(name:str):
+    mod=_EXPORTS.get(name)
+    if mod is None:raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(mod),name)
+
+__all__=list(_EXPORTS)
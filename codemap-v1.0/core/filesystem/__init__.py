@@ -1,10 +1,15 @@
 from core.filesystem.file_filter import FileFilter
-from core.filesystem.file_watcher import watch_filesystem
-from core.filesystem.tree_builder import build_tree
+from core.filesystem.tree_builder import ScanProgress, build_tree, scan_tree
+
+def watch_filesystem(*args, **kwargs):
+    from core.filesystem.file_watcher import watch_filesystem as _watch
+    return _watch(*args, **kwargs)
 
 __all__ = [
     'FileFilter',
     'watch_filesystem',
-    'build_tree'
+    'build_tree',
+    'scan_tree',
+    'ScanProgress'
 
 ]
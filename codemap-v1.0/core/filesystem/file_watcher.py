@@ -4,7 +4,8 @@ from typing import Dict
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, FileSystemEvent
 from core.model.tree_node import TreeNode
-from core.operations.tokens import update_node_token_count, token_count_manager
+from core.model.changes import ChangeBus, ChangeType
+from core.operations.tokens import token_count_manager, token_updates
 from core.filesystem.file_filter import FileFilter
 
 class _WatchdogHandler(FileSystemEventHandler):
@@ -13,32 +14,40 @@ class _WatchdogHandler(FileSystemEventHandler):
         root_path: str,
         file_filter: FileFilter,
         path_to_node: Dict[str, TreeNode],
-        tree_changed_flag: threading.Event,
+        changes: ChangeBus,
         lock: threading.Lock,
     ) -> None:
         super().__init__()
         self.root_path = root_path
         self.file_filter = file_filter
         self.path_to_node = path_to_node
-        self.tree_changed_flag = tree_changed_flag
+        self.changes = changes
         self.lock = lock
 
     def _add_file(self, path: str, is_dir: bool) -> None:
         parent_path = os.path.dirname(path)
         node_added = False
         new_node = None
+        st = None
+        if not is_dir:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return
         with self.lock:
             parent = self.path_to_node.get(parent_path)
             if parent and parent.is_dir and path not in self.path_to_node:
                 new_node = TreeNode(path, is_dir, parent)
+                if st is not None:
+                    new_node.set_stat(st)
                 parent.add_child(new_node)
                 parent.sort_children()
                 self.path_to_node[path] = new_node
                 node_added = True
         if node_added:
-            self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.NODE_ADDED, path)
             if not is_dir and new_node:
-                token_count_manager.queue_token_count(path, self._token_cb)
+                token_count_manager.queue_token_count(path, token_updates.push, key=new_node.stat_key)
 
     def _remove_file(self, path: str) -> None:
         node_removed = False
@@ -68,18 +77,7 @@ class _WatchdogHandler(FileSystemEventHandler):
                         curr.token_count -= original_count
                         curr = curr.parent
         if node_removed:
-            self.tree_changed_flag.set()
-
-    def _token_cb(self, node_path: str, count: int) -> None:
-        node_updated = False
-        with self.lock:
-            node = self.path_to_node.get(node_path)
-            if node and not node.is_dir:
-                 changed = update_node_token_count(node, count)
-                 if changed:
-                    node_updated = True
-        if node_updated:
-             self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.NODE_REMOVED, path)
 
     def on_created(self, event: FileSystemEvent):
         base_name = os.path.basename(event.src_path)
@@ -103,7 +101,18 @@ class _WatchdogHandler(FileSystemEventHandler):
         _, ext = os.path.splitext(base_name)
         if self.file_filter.allowed_extensions and ext.lower() not in self.file_filter.allowed_extensions:
             return
-        token_count_manager.queue_token_count(event.src_path, self._token_cb, force_update=True)
+        try:
+            st = os.stat(event.src_path)
+        except OSError:
+            return
+        with self.lock:
+            node = self.path_to_node.get(event.src_path)
+            if node and not node.is_dir:
+                node.set_stat(st)
+                key = node.stat_key
+            else:
+                key = None
+        token_count_manager.queue_token_count(event.src_path, token_updates.push, force_update=True, key=key)
 
     def on_moved(self, event: FileSystemEvent):
         self._remove_file(event.src_path)
@@ -120,12 +129,12 @@ def watch_filesystem(
     root_path: str,
     file_filter: FileFilter,
     path_to_node: Dict[str, TreeNode],
-    tree_changed_flag: threading.Event,
+    changes: ChangeBus,
     stop_event: threading.Event,
     lock: threading.Lock,
 
 ) -> None:
-    handler = _WatchdogHandler(root_path, file_filter, path_to_node, tree_changed_flag, lock)
+    handler = _WatchdogHandler(root_path, file_filter, path_to_node, changes, lock)
     observer = Observer()
     observer.schedule(handler, root_path, recursive=True)
     observer.start()
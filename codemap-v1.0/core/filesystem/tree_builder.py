@@ -1,62 +1,118 @@
 import os
 import threading
-from typing import Dict, Set, Deque
+import time
+from typing import Any, Dict, Set, Deque, Optional
 from collections import deque
 
 from core.model.tree_node import TreeNode
-from core.operations.tokens import token_count_manager, update_node_token_count
+from core.model.changes import ChangeBus, ChangeType
+from core.operations.tokens import token_count_manager, token_updates
 from core.filesystem.file_filter import FileFilter
+from core.utils.scheduler import VISIBLE, BACKGROUND
+from core.utils.state import apply_node_state
 
-def build_tree(root_path: str, file_filter: FileFilter,
-               path_to_node: Dict[str, TreeNode], lock: threading.Lock) -> TreeNode:
-    root_node = TreeNode(root_path, True)
-    root_node.expanded = True
-    with lock:
-        path_to_node[root_path] = root_node
-    queue: Deque[TreeNode] = deque([root_node])
+class ScanProgress:
+    def __init__(self):
+        self.dirs = 0
+        self.files = 0
+        self.done = False
+        self.started = time.perf_counter()
+
+    def status(self) -> str:
+        return "" if self.done else f"Scanning {self.dirs} dirs, {self.files} files"
+
+def _list_dir(dir_path: str, file_filter: FileFilter):
+    dirs = []
+    files = []
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            if file_filter.is_ignored(entry.name):
+                continue
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                dirs.append(entry)
+            else:
+                files.append(entry)
+    dirs.sort(key=lambda e: e.name.lower())
+    files.sort(key=lambda e: e.name.lower())
+    return dirs, files
+
+def scan_tree(root_node: TreeNode, file_filter: FileFilter, path_to_node: Dict[str, TreeNode],
+              lock: threading.Lock, changes: Optional[ChangeBus] = None,
+              state: Optional[Dict[str, Any]] = None, progress: Optional[ScanProgress] = None) -> TreeNode:
+    root_path = root_node.path
+    visible: Deque[TreeNode] = deque([root_node])
+    hidden: Deque[TreeNode] = deque()
     processed_dirs: Set[str] = set([root_path])
-    token_count_tasks = 0
-    while queue:
-        current_dir_node = queue.popleft()
+    while visible or hidden:
+        shown = bool(visible)
+        current_dir_node = visible.popleft() if shown else hidden.popleft()
+        shown = shown and current_dir_node.expanded
         dir_path = current_dir_node.path
         try:
-            contents = os.listdir(dir_path)
-            dirs = []
-            files = []
-            for name in contents:
-                if file_filter.is_ignored(name):
-                    continue
-                full_path = os.path.join(dir_path, name)
-                if os.path.isdir(full_path):
-                    dirs.append(name)
-                else:
-                    files.append(name)
-            for dirname in sorted(dirs, key=str.lower):
-                full_path = os.path.join(dir_path, dirname)
+            dirs, files = _list_dir(dir_path, file_filter)
+        except (PermissionError, FileNotFoundError, OSError):
+            continue
+        stats = []
+        for entry in files:
+            try:
+                stats.append(entry.stat())
+            except OSError:
+                stats.append(None)
+        added = []
+        queued = []
+        with lock:
+            for entry in dirs:
+                full_path = os.path.join(dir_path, entry.name)
                 if full_path in processed_dirs:
                     continue
                 processed_dirs.add(full_path)
-                with lock:
+                dir_node = path_to_node.get(full_path)
+                if dir_node is None:
                     dir_node = TreeNode(full_path, True, current_dir_node)
+                    if state:
+                        apply_node_state(dir_node, state, root_path)
                     current_dir_node.add_child(dir_node)
                     path_to_node[full_path] = dir_node
-                queue.append(dir_node)
-            for filename in sorted(files, key=str.lower):
-                full_path = os.path.join(dir_path, filename)
-                with lock:
-                    file_node = TreeNode(full_path, False, current_dir_node)
-                    def token_count_callback(node_path: str, token_count: int) -> None:
-                        with lock:
-                            node = path_to_node.get(node_path)
-                            if node and not node.is_dir:
-                                update_node_token_count(node, token_count)
-                    if token_count_tasks < 50:
-                        token_count_manager.queue_token_count(full_path, token_count_callback)
-                        token_count_tasks += 1
-                    current_dir_node.add_child(file_node)
-                    path_to_node[full_path] = file_node
-        except (PermissionError, FileNotFoundError, OSError):
-            continue
+                    added.append(full_path)
+                (visible if shown and dir_node.expanded else hidden).append(dir_node)
+            for entry, st in zip(files, stats):
+                full_path = os.path.join(dir_path, entry.name)
+                if full_path in path_to_node:
+                    continue
+                file_node = TreeNode(full_path, False, current_dir_node)
+                if st is not None:
+                    file_node.set_stat(st)
+                if state:
+                    apply_node_state(file_node, state, root_path)
+                current_dir_node.add_child(file_node)
+                path_to_node[full_path] = file_node
+                added.append(full_path)
+                prio = VISIBLE if shown and not file_node.disabled else BACKGROUND
+                queued.append((full_path, file_node.stat_key, prio))
+        for full_path, key, prio in queued:
+            token_count_manager.queue_token_count(full_path, token_updates.push, key=key, priority=prio)
+        if progress:
+            progress.dirs += 1
+            progress.files += len(files)
+        if changes is not None and added:
+            changes.publish(ChangeType.NODE_ADDED, *added)
     file_filter.clear_cache()
-    root_node.calculate_token_count()
+    with lock:
+        root_node.calculate_token_count()
+    if progress:
+        progress.done = True
+    if changes is not None:
+        changes.publish(ChangeType.STATE, root_path)
     return root_node
+
+def build_tree(root_path: str, file_filter: FileFilter,
+               path_to_node: Dict[str, TreeNode], lock: threading.Lock) -> TreeNode:
+    root_node = TreeNode(root_path, True)
+    root_node.expanded = True
+    with lock:
+        path_to_node[root_path] = root_node
+    return scan_tree(root_node, file_filter, path_to_node, lock)
@@ -1,6 +1,9 @@
 from core.model.tree_node import TreeNode
+from core.model.changes import ChangeBus, ChangeType
 
 __all__ = [
     'TreeNode',
+    'ChangeBus',
+    'ChangeType',
 
 ]
@@ -0,0 +1,27 @@
+from collections import deque
+from enum import Enum, auto
+from typing import Deque, Dict, Set, Tuple
+
+class ChangeType(Enum):
+    NODE_ADDED   = auto()
+    NODE_REMOVED = auto()
+    EXPANSION    = auto()
+    STATE        = auto()
+
+class ChangeBus:
+    def __init__(self):
+        self._q: Deque[Tuple[ChangeType, Tuple[str, ...]]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def publish(self, kind: ChangeType, *paths: str):
+        self._q.append((kind, paths))
+
+    def drain(self) -> Dict[ChangeType, Set[str]]:
+        q = self._q
+        out: Dict[ChangeType, Set[str]] = {}
+        for _ in range(len(q)):
+            kind, paths = q.popleft()
+            out.setdefault(kind, set()).update(paths)
+        return out
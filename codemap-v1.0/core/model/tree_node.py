@@ -1,5 +1,5 @@
 import os
-from typing import List,Optional,Dict
+from typing import List,Optional,Dict,Tuple
 
 class TreeNode:
     _basename_cache:Dict[str,str]={}
@@ -20,7 +20,16 @@ class TreeNode:
         self.disabled=False if not is_dir else None
         self.children:List["TreeNode"]=[]
         self.token_count=0
+        self.token_approx=False
+        self.token_bound=0
+        self.kind="text"
+        self.size=0
+        self.mtime_ns=0
+        self.ino=0
         self.parent=parent
+    def set_stat(self,st:os.stat_result)->None:self.size,self.mtime_ns,self.ino=st.st_size,st.st_mtime_ns,st.st_ino
+    @property
+    def stat_key(self)->Optional[Tuple[int,int,int]]:return (self.size,self.mtime_ns,self.ino) if self.mtime_ns else None
     def add_child(self,child:"TreeNode")->None:self.children.append(child)
     def sort_children(self)->None:self.children.sort(key=lambda n:(not n.is_dir,n.display_name.lower()))
 
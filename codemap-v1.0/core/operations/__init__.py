@@ -6,11 +6,11 @@ from core.operations.tree_ops import (
 
 from core.operations.file_ops import (
 
-    collect_visible_files, calculate_token_counts
+    collect_visible_files, calculate_token_counts, pack_chunks, read_file_content
 
 )
 
-from core.operations.tokens import update_node_token_count, token_count_manager
+from core.operations.tokens import TokenResult, update_node_token_count, token_count_manager, token_updates
 
 __all__ = [
 
@@ -20,7 +20,11 @@ __all__ = [
     'flatten_tree',
     'collect_visible_files',
     'calculate_token_counts',
+    'pack_chunks',
+    'read_file_content',
     'update_node_token_count',
-    'token_count_manager'
+    'TokenResult',
+    'token_count_manager',
+    'token_updates'
 
 ]
@@ -0,0 +1,67 @@
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from config.constants import COPY_FORMAT_PRESETS, count_tokens, count_tokens_batch
+from config.tokenizers import on_tokenizer_ready
+from core.refactor.language import determine_language
+from core.utils.caching import LRUCache
+
+_MAX_PATHS = 100_000
+
+_SEPARATOR = "\n"
+
+_SENTINEL = "x"
+
+def _template(fmt: str) -> str:
+    return COPY_FORMAT_PRESETS.get(fmt, COPY_FORMAT_PRESETS["optimized"])
+
+def _shell(fmt: str, disp: str) -> str:
+    return _template(fmt).format(path=disp, content=_SENTINEL, language=determine_language(disp)) + _SEPARATOR
+
+class TemplateOverhead:
+    def __init__(self, max_paths: int = _MAX_PATHS):
+        self._paths: LRUCache[Tuple[str, str], int] = LRUCache(max_paths)
+        self._const: Dict[Tuple[str, str], int] = {}
+        self._sentinel = None
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def reset(self):
+        with self._lock:
+            self._paths.clear()
+            self._const = {}
+            self._sentinel = None
+            self.generation += 1
+
+    def _base(self) -> int:
+        if self._sentinel is None:
+            self._sentinel = count_tokens(_SENTINEL)
+        return self._sentinel
+
+    def constant(self, fmt: str, language: str) -> int:
+        hit = self._const.get((fmt, language))
+        if hit is None:
+            hit = count_tokens(_template(fmt).format(path="", content=_SENTINEL, language=language) + _SEPARATOR) - self._base()
+            self._const[(fmt, language)] = hit
+        return hit
+
+    def for_paths(self, fmt: str, disps: Sequence[str]) -> List[int]:
+        if "{path}" not in _template(fmt):
+            return [self.constant(fmt, determine_language(d)) for d in disps]
+        out = [self._paths.get((fmt, d)) for d in disps]
+        miss = [i for i, v in enumerate(out) if v is None]
+        if miss:
+            base = self._base()
+            for i, cnt in zip(miss, count_tokens_batch([_shell(fmt, disps[i]) for i in miss])):
+                out[i] = cnt - base
+                self._paths.put((fmt, disps[i]), out[i])
+        return out
+
+    def get(self, fmt: str, disp: str) -> int:
+        return self.for_paths(fmt, [disp])[0]
+
+template_overhead = TemplateOverhead()
+
+on_tokenizer_ready(template_overhead.reset)
+
+__all__ = ["TemplateOverhead", "template_overhead"]
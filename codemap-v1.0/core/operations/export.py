@@ -0,0 +1,200 @@
+import os, threading, time
+from functools import partial
+from fnmatch import fnmatch
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import IGNORED_PATTERNS, ALLOWED_EXTENSIONS
+from config.tokenizers import get_tokenizer
+from core.filesystem.file_filter import FileFilter
+from core.filesystem.tree_builder import _list_dir
+from core.operations.bundle import template_overhead
+from core.operations.file_ops import pack_chunks, read_file_content
+from core.operations.stripped import stripped_cache
+from core.operations.tokens import TokenResult, token_count_manager
+from core.utils.caching import stat_key
+from core.utils.clipboard import FileSink, stream_fragments
+from core.utils.debug import log
+from core.utils.scheduler import INTERACTIVE, scheduler
+
+_EXPORT_READ_AHEAD = 64
+
+_EXPORT_BATCH = 64
+
+_TALLY_STALL = 30.0
+
+class ExportResult:
+    def __init__(self):
+        self.files = 0
+        self.chars = 0
+        self.tokens = 0
+        self.approx = False
+        self.cached = 0
+        self.elapsed = 0.0
+        self.parts: List[str] = []
+
+    def summary(self) -> str:
+        tok = f"{'~' if self.approx else ''}{self.tokens}"
+        parts = f" in {len(self.parts)} part(s)" if self.parts else ""
+        return f"Exported {self.files} file(s){parts}, {self.chars} chars, {tok} tokens ({self.cached} from cache) in {self.elapsed:.2f}s"
+
+class _Tally:
+    def __init__(self, paths: List[str]):
+        self.results: Dict[str, TokenResult] = {}
+        self._paths = paths
+        self._left = len(paths)
+        self._lock = threading.Lock()
+        self.done = threading.Event()
+        if not paths:
+            self.done.set()
+
+    def push(self, path: str, res: TokenResult):
+        with self._lock:
+            first = path not in self.results
+            self.results[path] = res
+            if first:
+                self._left -= 1
+                if self._left == 0:
+                    self.done.set()
+
+    def wait(self, stall: float = _TALLY_STALL):
+        left = self._left
+        while not self.done.wait(stall):
+            with self._lock:
+                if self._left == left:
+                    log("EXPORT_TOKENS_STALLED", self._left, "file(s)", level=30)
+                    for path in self._paths:
+                        self.results.setdefault(path, TokenResult(0, True))
+                    self.done.set()
+                left = self._left
+
+def _matches(rel: str, patterns: Sequence[str]) -> bool:
+    name = rel.rsplit("/", 1)[-1]
+    return any(fnmatch(rel, p) or fnmatch(name, p) for p in patterns)
+
+def select_files(root_path: str, file_filter: FileFilter, state: Optional[Dict[str, Any]] = None,
+                 include: Sequence[str] = (), exclude: Sequence[str] = ()) -> List[Tuple[str, str]]:
+    out: List[Tuple[str, str]] = []
+    def entry(rel: str) -> Dict[str, Any]:
+        return state.get(rel.replace("/", os.sep), {})
+    def walk(dir_path: str, prefix: str):
+        try:
+            dirs, files = _list_dir(dir_path, file_filter)
+        except OSError:
+            return
+        for e in dirs:
+            rel = prefix + e.name
+            if state is not None and not entry(rel).get("expanded", False):
+                continue
+            if exclude and _matches(rel, exclude):
+                continue
+            walk(e.path, rel + "/")
+        for e in files:
+            rel = prefix + e.name
+            if state is not None and entry(rel).get("disabled", False):
+                continue
+            if include and not _matches(rel, include):
+                continue
+            if exclude and _matches(rel, exclude):
+                continue
+            out.append((rel, e.path))
+    walk(root_path, "")
+    return out
+
+def _read_stripped(path: str, count: bool = True) -> str:
+    return stripped_cache.text(path, read_file_content, count)
+
+def _stripped_count(path: str) -> int:
+    return stripped_cache.get(path, read_file_content)[1]
+
+def _stripped_tally(files: List[Tuple[str, str]]) -> _Tally:
+    paths = [p for _, p in files]
+    tally = _Tally(paths)
+    for path, cnt in zip(paths, scheduler.map(_stripped_count, paths, priority=INTERACTIVE)):
+        tally.push(path, TokenResult(cnt or 0, not get_tokenizer().exact))
+    return tally
+
+def _queue_counts(files: List[Tuple[str, str]]) -> _Tally:
+    tally = _Tally([p for _, p in files])
+    for _, path in files:
+        try:
+            key = stat_key(os.stat(path))
+        except OSError:
+            tally.push(path, TokenResult(0))
+            continue
+        token_count_manager.queue_token_count(path, tally.push, key=key, priority=INTERACTIVE)
+    return tally
+
+def _prepare(root_path: str, path_mode: str, state: Optional[Dict[str, Any]], include: Sequence[str],
+             exclude: Sequence[str], file_filter: Optional[FileFilter], tokens: bool, strip: bool) -> Tuple[List[Tuple[str, str]], Optional[_Tally], int]:
+    files = select_files(root_path, file_filter or FileFilter(IGNORED_PATTERNS, ALLOWED_EXTENSIONS), state, include, exclude)
+    if path_mode == "basename":
+        files = [(rel.rsplit("/", 1)[-1], path) for rel, path in files]
+    elif os.sep != "/":
+        files = [(rel.replace("/", os.sep), path) for rel, path in files]
+    if not tokens:
+        return files, None, 0
+    tok = get_tokenizer()
+    try:
+        getattr(tok, "full", tok).warm()
+    except Exception as e:
+        log("EXPORT_TOKENIZER_FAIL", e, level=30)
+    if strip:
+        return files, None, 0
+    hits = token_count_manager.cache_stats().get("hits", 0)
+    return files, _queue_counts(files), hits
+
+def _write(files: List[Tuple[str, str]], out, fmt: str, strip: bool, tokens: bool = True) -> int:
+    sink = FileSink(out)
+    read, tag = (partial(_read_stripped, count=tokens), "\0strip") if strip else (read_file_content, "")
+    stream_fragments(files, fmt, read, sink, read_ahead=_EXPORT_READ_AHEAD, batch=_EXPORT_BATCH, tag=tag)
+    if files:
+        sink.write("\n")
+        sink.close()
+    return sink.chars
+
+def _sizes(files: List[Tuple[str, str]], fmt: str, tally: _Tally) -> List[int]:
+    tally.wait()
+    extra = template_overhead.for_paths(fmt, [disp for disp, _ in files])
+    return [tally.results[p].count + e for (_, p), e in zip(files, extra)]
+
+def _finish(res: ExportResult, files: List[Tuple[str, str]], fmt: str, tally: Optional[_Tally], hits: int, start: float) -> ExportResult:
+    res.files = len(files)
+    if tally is not None:
+        res.tokens = sum(_sizes(files, fmt, tally))
+        res.approx = any(r.approx for r in tally.results.values())
+        res.cached = token_count_manager.cache_stats().get("hits", 0) - hits
+    res.elapsed = time.perf_counter() - start
+    log("EXPORT", res.files, "file(s)", len(res.parts) or 1, "part(s)", res.chars, "chars", res.tokens, "tokens", f"{res.elapsed * 1000.0:.0f}ms")
+    return res
+
+def export_bundle(root_path: str, out, fmt: str, path_mode: str = "relative", state: Optional[Dict[str, Any]] = None,
+                  include: Sequence[str] = (), exclude: Sequence[str] = (), file_filter: Optional[FileFilter] = None,
+                  tokens: bool = True, strip: bool = False) -> ExportResult:
+    start = time.perf_counter()
+    res = ExportResult()
+    files, tally, hits = _prepare(root_path, path_mode, state, include, exclude, file_filter, tokens, strip)
+    res.chars = _write(files, out, fmt, strip, tokens)
+    if strip and tokens:
+        tally = _stripped_tally(files)
+    return _finish(res, files, fmt, tally, hits, start)
+
+def chunk_path(output: str, part: int) -> str:
+    base, ext = os.path.splitext(output)
+    return f"{base}.{part}{ext}"
+
+def export_chunks(root_path: str, output: str, fmt: str, budget: int, path_mode: str = "relative",
+                  state: Optional[Dict[str, Any]] = None, include: Sequence[str] = (), exclude: Sequence[str] = (),
+                  file_filter: Optional[FileFilter] = None, strip: bool = False) -> ExportResult:
+    start = time.perf_counter()
+    res = ExportResult()
+    files, tally, hits = _prepare(root_path, path_mode, state, include, exclude, file_filter, True, strip)
+    if strip:
+        tally = _stripped_tally(files)
+    for i, part in enumerate(pack_chunks(list(zip(files, _sizes(files, fmt, tally))), budget), 1):
+        dst = chunk_path(output, i)
+        with open(dst, "w", encoding="utf-8", newline="") as out:
+            res.chars += _write(part, out, fmt, strip)
+        res.parts.append(dst)
+    return _finish(res, files, fmt, tally, hits, start)
+
+__all__ = ["ExportResult", "select_files", "export_bundle", "export_chunks", "chunk_path"]
@@ -1,8 +1,20 @@
-import os, threading, time
-from typing import List, Tuple, Dict, Set
+import os, threading
+from typing import List, Tuple, Dict, Set, TypeVar
 
 from core.model.tree_node import TreeNode
-from core.operations.tokens import token_count_manager, update_node_token_count
+from core.operations.tokens import token_count_manager, token_updates
+from core.utils.scheduler import VISIBLE, BACKGROUND
+
+T = TypeVar("T")
+
+_UNREADABLE = "<Could not read file>"
+
+def read_file_content(path: str) -> str:
+    try:
+        with open(path, "rb") as f:
+            return f.read().decode("latin-1")
+    except Exception:
+        return _UNREADABLE
 
 def collect_visible_files(node: TreeNode, path_mode: str) -> List[Tuple[str, str]]:
     files = []
@@ -18,48 +30,45 @@ def collect_visible_files(node: TreeNode, path_mode: str) -> List[Tuple[str, str
                     recurse(child, parts + [nd.display_name])
         elif not nd.disabled:
             try:
-                if os.path.exists(nd.path):
-                    with open(nd.path, "r", encoding="utf-8", errors="ignore") as f:
-                        content = f.read()
-                else:
-                    content = "<File not found>"
+                with open(nd.path, "r", encoding="utf-8", errors="ignore") as f:
+                    content = f.read()
+            except FileNotFoundError:
+                content = "<File not found>"
             except Exception as e:
                 content = f"<Could not read file: {e}>"
             files.append((display, content))
     recurse(node, [])
     return files
 
+def pack_chunks(items: List[Tuple[T, int]], budget: int) -> List[List[T]]:
+    if budget <= 0:
+        return [[item for item, _ in items]] if items else []
+    chunks: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item, tokens in items:
+        if current and used + tokens > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
 def calculate_token_counts(
-    root: TreeNode, path_to_node: Dict[str, TreeNode],
-    tree_changed_flag: threading.Event, lock: threading.Lock
+    root: TreeNode, path_to_node: Dict[str, TreeNode], lock: threading.Lock
 
 ) -> None:
     if not token_count_manager.is_running:
         token_count_manager.start()
-    def token_cb(node_path: str, cnt: int):
-        update = False
-        with lock:
-            n = path_to_node.get(node_path)
-            if n and not n.is_dir:
-                if update_node_token_count(n, cnt):
-                    update = True
-        if update:
-            tree_changed_flag.set()
-    def _schedule(paths: List[str]):
-        for p in paths:
-            token_count_manager.queue_token_count(p, token_cb, force_update=False)
     visible = []
+    remaining = []
     with lock:
         for n in path_to_node.values():
-            if not n.is_dir and not n.disabled and (n.parent is None or n.parent.expanded):
-                visible.append(n.path)
-    _schedule(visible)
-    def _later():
-        time.sleep(3)
-        remaining = []
-        with lock:
-            for n in path_to_node.values():
-                if n.path not in visible and not n.is_dir and not n.disabled:
-                    remaining.append(n.path)
-        _schedule(remaining)
-    threading.Thread(target=_later, daemon=True, name="tok_lazy").start()
+            if n.is_dir or n.disabled:
+                continue
+            (visible if n.parent is None or n.parent.expanded else remaining).append(n)
+    for prio, nodes in ((VISIBLE, visible), (BACKGROUND, remaining)):
+        for n in nodes:
+            token_count_manager.queue_token_count(n.path, token_updates.push, key=n.stat_key, priority=prio)
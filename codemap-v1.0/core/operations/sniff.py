@@ -0,0 +1,86 @@
+import os, re
+from typing import Optional
+
+from core.utils.caching import LRUCache
+
+SNIFF_BYTES      = 8192
+
+TEXT             = "text"
+
+BINARY           = "binary"
+
+MINIFIED         = "minified"
+
+GENERATED        = "generated"
+
+KIND_TAGS        = {BINARY: "bin", MINIFIED: "min", GENERATED: "gen"}
+
+_MARKER_SPAN     = 2048
+
+_MINIFIED_LINE   = 2_000
+
+_MINIFIED_AVG    = 300
+
+_MINIFIED_MIN    = 1024
+
+_CONTROL_RATIO   = 0.10
+
+_GENERATED_MARKERS = (
+    re.compile(rb"^// Code generated .* DO NOT EDIT\.$"), re.compile(rb"\bDO NOT EDIT\b"), re.compile(rb"(?<![\w@])@generated\b"),
+
+)
+
+_COMMENT_PREFIXES = (b"#", b"//", b"/*", b"*", b"--", b";", b"%", b"<!--", b'"""', b"'''")
+
+_CONTROL = bytes(b for b in range(32) if b not in (9, 10, 12, 13, 27))
+
+_cache: LRUCache = LRUCache(65536)
+
+def _generated(head: bytes) -> bool:
+    for line in head[:_MARKER_SPAN].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if not line.startswith(_COMMENT_PREFIXES):
+            return False
+        if any(m.search(line) for m in _GENERATED_MARKERS):
+            return True
+    return False
+
+def classify_bytes(head: bytes) -> str:
+    if not head:
+        return TEXT
+    if b"\x00" in head:
+        return BINARY
+    if len(head.translate(None, _CONTROL)) < len(head) * (1 - _CONTROL_RATIO):
+        return BINARY
+    if _generated(head):
+        return GENERATED
+    lines = head.split(b"\n")
+    if len(lines) > 1 and len(head) >= SNIFF_BYTES:
+        lines.pop()
+    if max(len(l) for l in lines) >= _MINIFIED_LINE or (len(head) >= _MINIFIED_MIN and len(head) / len(lines) >= _MINIFIED_AVG):
+        return MINIFIED
+    return TEXT
+
+def classify(path: str, mtime_ns: Optional[int] = None) -> str:
+    mtime = os.stat(path).st_mtime_ns if mtime_ns is None else mtime_ns
+    hit = _cache.get(path)
+    if hit is not None and hit[0] == mtime:
+        return hit[1]
+    with open(path, "rb") as f:
+        kind = classify_bytes(f.read(SNIFF_BYTES))
+    _cache.put(path, (mtime, kind))
+    return kind
+
+def remember(path: str, mtime_ns: int, kind: str) -> None:
+    _cache.put(path, (mtime_ns, kind))
+
+def trim_cache(n: int = 16_384) -> None:
+    _cache.prune(n)
+
+__all__ = [
+    "SNIFF_BYTES", "TEXT", "BINARY", "MINIFIED", "GENERATED", "KIND_TAGS",
+    "classify_bytes", "classify", "remember", "trim_cache",
+
+]
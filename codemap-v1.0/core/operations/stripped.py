@@ -0,0 +1,98 @@
+import os, threading
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from config.constants import count_tokens
+from config.tokenizers import get_tokenizer
+from core.refactor.language import determine_language, remove_extra_whitespace, strip_comments_and_docstrings
+from core.utils.caching import StatCache, StatKey, stat_key
+from core.utils.debug import log
+from core.utils.scheduler import BACKGROUND, scheduler
+
+_MAX_FILES = 20_000
+
+_MAX_BYTES = 64 << 20
+
+_BATCH     = 32
+
+def strip_source(path: str, text: str) -> str:
+    language = determine_language(path)
+    if language == "text":
+        return remove_extra_whitespace(text)
+    try:
+        return strip_comments_and_docstrings(text, language)
+    except ImportError:
+        return remove_extra_whitespace(text)
+
+class StrippedCache:
+    def __init__(self, max_files: int = _MAX_FILES, max_bytes: int = _MAX_BYTES):
+        self._cache: StatCache[Tuple[str, int, bool]] = StatCache(max_files, max_bytes, cost=lambda _p, v: len(v[0]))
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def _valid(self, hit: Optional[Tuple[str, int, bool]]) -> bool:
+        return hit is not None and (hit[2] or not get_tokenizer().exact)
+
+    def count(self, path: str, key: Optional[StatKey]) -> Optional[int]:
+        if key is None:
+            return None
+        hit = self._cache.get(path, key)
+        return hit[1] if self._valid(hit) else None
+
+    def get(self, path: str, read: Callable[[str], str], key: Optional[StatKey] = None) -> Tuple[str, int]:
+        if key is None:
+            try:
+                key = stat_key(os.stat(path))
+            except OSError:
+                key = None
+        hit = self._cache.get(path, key) if key is not None else None
+        if self._valid(hit):
+            return hit[0], hit[1]
+        exact = get_tokenizer().exact
+        text = self._strip(path, read)
+        cnt = count_tokens(text) if text else 0
+        if key is not None:
+            self._cache.put(path, key, (text, cnt, exact))
+        return text, cnt
+
+    def _strip(self, path: str, read: Callable[[str], str]) -> str:
+        try:
+            return strip_source(path, read(path))
+        except Exception as e:
+            log("STRIP_FAIL", path, e, level=30)
+            return ""
+
+    def text(self, path: str, read: Callable[[str], str], count: bool = True) -> str:
+        if count:
+            return self.get(path, read)[0]
+        try:
+            hit = self._cache.get(path, stat_key(os.stat(path)))
+        except OSError:
+            hit = None
+        return hit[0] if hit is not None else self._strip(path, read)
+
+    def queue(self, items: Iterable[Tuple[str, StatKey]], read: Callable[[str], str], priority: int = BACKGROUND):
+        with self._lock:
+            todo = [(p, k) for p, k in items if p not in self._pending]
+            self._pending.update(p for p, _ in todo)
+        for i in range(0, len(todo), _BATCH):
+            scheduler.submit(self._run, todo[i:i + _BATCH], read, priority=priority)
+
+    def _run(self, batch: List[Tuple[str, StatKey]], read: Callable[[str], str]):
+        try:
+            for path, key in batch:
+                self.get(path, read, key)
+        finally:
+            with self._lock:
+                self._pending.difference_update(p for p, _ in batch)
+                self.generation += 1
+
+    def trim(self):
+        self._cache.trim()
+
+    def stats(self) -> Dict[str, int]:
+        return self._cache.stats()
+
+stripped_cache = StrippedCache()
+
+__all__ = ["StrippedCache", "stripped_cache", "strip_source"]
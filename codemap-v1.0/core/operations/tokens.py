@@ -1,103 +1,486 @@
-import os, threading, concurrent.futures, time
-from functools import lru_cache
-from typing import Callable, Dict
+import os, threading, concurrent.futures, time, codecs, mmap, math, random, json, tempfile
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Set, Tuple
 
-from config.constants import count_tokens
+from config.constants import count_tokens, count_tokens_batch
+from config.tokenizers import get_tokenizer, on_tokenizer_ready, set_tokenizer, tokenizer_spec
+from core.operations.sniff import SNIFF_BYTES, TEXT, BINARY, classify, classify_bytes, remember
+from core.utils.caching import StatCache, StatKey, stat_key
 from core.utils.debug import log
+from core.utils.scheduler import PRIORITY_NAMES, VISIBLE, BACKGROUND, scheduler
 
 _MAX_CACHE       = 100_000
 
+_CACHE_BYTES     = 32 << 20
+
 _FAST_THRESHOLD  = 200_000
 
 _APPROX_DIVISOR  = 4
 
 _MAX_WORKERS_CAP = 8
 
+_BATCH_FILES     = 64
+
+_BATCH_BYTES     = 1_000_000
+
+_PROC_MIN_FILES  = 2_000
+
+_STREAM_CHUNK    = 1 << 20
+
+_EXACT_LIMIT     = 32 << 20
+
+_SAMPLE_WINDOWS  = 16
+
+_SAMPLE_BYTES    = 16 << 10
+
+_SAMPLE_Z        = 1.96
+
+TOKEN_ENGINES    = ("auto", "thread", "process")
+
+@dataclass(frozen=True)
+class TokenResult:
+    count: int
+    approx: bool = False
+    bound: int = 0
+    kind: str = TEXT
+
+TokenCallback = Callable[[str, TokenResult], None]
+
+def _safe_cut(text: str) -> int:
+    i = text.rfind("\n", 0, len(text) - 1)
+    while i >= 0 and text[i + 1].isspace():
+        i = text.rfind("\n", 0, i)
+    if i >= 0:
+        return i + 1
+    i = text.rfind(" ", 1, len(text) - 1)
+    while i > 0 and (text[i - 1].isspace() or text[i + 1].isspace()):
+        i = text.rfind(" ", 1, i)
+    return i if i > 0 else len(text)
+
+def count_tokens_streaming(path: str, chunk_size: int = _STREAM_CHUNK) -> int:
+    dec = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    total = 0
+    carry = ""
+    with open(path, "rb") as f:
+        while True:
+            raw = f.read(chunk_size)
+            text = carry + dec.decode(raw, final=not raw)
+            if not raw:
+                return total + (count_tokens(text) if text else 0)
+            cut = _safe_cut(text)
+            total += count_tokens(text[:cut])
+            carry = text[cut:]
+
+def estimate_tokens_sampled(path: str, windows: int = _SAMPLE_WINDOWS, window: int = _SAMPLE_BYTES) -> Tuple[int, int, bool]:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= windows * window:
+            return count_tokens(f.read().decode("utf-8", "ignore")), 0, True
+        rng = random.Random(f"{path}:{size}")
+        ratios: List[float] = []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            stride = size // windows
+            for i in range(windows):
+                lo = i * stride + rng.randrange(max(1, stride - window))
+                nl = mm.find(b"\n", lo, lo + window // 2)
+                start = nl + 1 if nl >= 0 else lo
+                end = min(size, start + window)
+                nl = mm.rfind(b"\n", start + window // 2, end)
+                end = nl + 1 if nl >= 0 else end
+                if end <= start:
+                    continue
+                ratios.append(count_tokens(mm[start:end].decode("utf-8", "ignore")) / (end - start))
+    if not ratios:
+        raise ValueError("no sample windows")
+    mean = sum(ratios) / len(ratios)
+    var = sum((r - mean) ** 2 for r in ratios) / max(1, len(ratios) - 1)
+    return max(1, round(mean * size)), round(_SAMPLE_Z * math.sqrt(var / len(ratios)) * size), False
+
+_proc_error: str | None = None
+
+def _proc_init(name: str, encoding: str | None):
+    global _proc_error
+    try:
+        set_tokenizer("tiktoken" if name == "auto" else name, encoding).warm()
+    except Exception as e:
+        _proc_error = f"{type(e).__name__}: {e}"
+
+def _sniffed_count(kind: str, size: int) -> int:
+    return 0 if kind == BINARY else max(1, size // _APPROX_DIVISOR)
+
+def _read_sniffed(path: str) -> Tuple[str, str | None, int]:
+    with open(path, "rb") as f:
+        data = f.read()
+    kind = classify_bytes(data[:SNIFF_BYTES])
+    return kind, (data.decode("utf-8", "ignore") if kind == TEXT else None), len(data)
+
+def _count_paths(paths: List[str]) -> Tuple[List[Tuple[int, str]], bool]:
+    if _proc_error is not None:
+        raise RuntimeError(f"tokenizer failed to load in worker: {_proc_error}")
+    exact = get_tokenizer().exact
+    out: List[Tuple[int, str]] = []
+    texts: List[str] = []
+    slots: List[int] = []
+    for p in paths:
+        try:
+            kind, text, size = _read_sniffed(p)
+        except OSError:
+            kind, text, size = TEXT, "", 0
+        if text is None:
+            out.append((_sniffed_count(kind, size), kind))
+            continue
+        slots.append(len(out))
+        out.append((0, kind))
+        texts.append(text)
+    for i, cnt in zip(slots, count_tokens_batch(texts, 1)):
+        out[i] = (cnt, TEXT)
+    return out, exact
+
 class TokenCountManager:
-    def __init__(self, max_workers: int | None = None):
+    def __init__(self, max_workers: int | None = None, engine: str | None = None, processes: int | None = None):
         self._max = max(2, min(_MAX_WORKERS_CAP, (os.cpu_count() or 4) // 2)) if max_workers is None else max_workers
-        self._pool: concurrent.futures.ThreadPoolExecutor | None = None
-        self._cache: Dict[str, Dict[str, int | float]] = {}
+        self._procs = max(1, (os.cpu_count() or 1) - 1) if processes is None else processes
+        self._engine = "auto"
+        self.set_engine(engine or os.getenv("CM_TOKEN_ENGINE", "auto"))
+        self._proc_pool: concurrent.futures.ProcessPoolExecutor | None = None
+        self._threads = max(1, (os.cpu_count() or 4) // self._max)
+        self._cache: StatCache[TokenResult] = StatCache(_MAX_CACHE, _CACHE_BYTES)
+        self._pending: List[Deque[Tuple[str, TokenCallback, bool, StatKey | None]]] = [deque() for _ in PRIORITY_NAMES]
+        self._drainers = 0
+        self._large_q: Deque[Tuple[str, TokenCallback, StatKey]] = deque()
+        self._large_busy = False
+        self._large_pending: Set[str] = set()
+        self._upgrade: Dict[str, TokenCallback] = {}
         self._lock = threading.Lock()
         self._started = False
     @property
     def is_running(self) -> bool:
         return self._started
+    @property
+    def engine(self) -> str:
+        return self._engine
+
+    def set_engine(self, engine: str):
+        if engine not in TOKEN_ENGINES:
+            log("TOKEN_ENGINE_UNKNOWN", engine, level=30)
+            engine = "auto"
+        if self._procs < 2 and engine == "auto":
+            engine = "thread"
+        self._engine = engine
+
+    def _process_pool(self) -> "concurrent.futures.ProcessPoolExecutor":
+        import multiprocessing
+        with self._lock:
+            if self._proc_pool is None:
+                self._proc_pool = concurrent.futures.ProcessPoolExecutor(
+                    self._procs, mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_proc_init, initargs=tokenizer_spec()
+                )
+                log("TOKEN_PROCESS_POOL", self._procs, "worker(s)")
+            return self._proc_pool
 
-    def _create_pool(self):
-        if self._pool is None:
-            self._pool = concurrent.futures.ThreadPoolExecutor(
-                self._max, thread_name_prefix="tok"
-            )
+    def _use_processes(self, backlog: int) -> bool:
+        if self._engine == "process":
+            return True
+        return self._engine == "auto" and (self._proc_pool is not None or backlog >= _PROC_MIN_FILES)
+
+    def _slots(self) -> int:
+        return max(self._max, self._procs) if self._use_processes(self._backlog()) else self._max
+
+    def _backlog(self) -> int:
+        return sum(len(q) for q in self._pending)
 
     def start(self):
         with self._lock:
             if self._started:
                 return
-            self._create_pool()
             self._started = True
             log("TokenCountManager started")
 
     def stop(self):
         with self._lock:
-            if self._pool:
-                self._pool.shutdown(wait=False)
-                self._pool = None
+            if self._proc_pool:
+                self._proc_pool.shutdown(wait=False, cancel_futures=True)
+                self._proc_pool = None
+            for q in self._pending:
+                q.clear()
+            self._large_q.clear()
+            self._large_pending.clear()
             self._started = False
             log("TokenCountManager stopped")
-    @lru_cache(65536)
-    def _should_read(self, path: str, mtime: float, force: bool) -> bool:
-        return force or path not in self._cache or mtime > self._cache[path]["mtime"]
+    def trim_cache(self):
+        self._cache.trim()
 
-    def _trim_cache(self):
-        if len(self._cache) <= _MAX_CACHE:
-            return
-        for k in list(self._cache.keys())[: len(self._cache) - _MAX_CACHE]:
-            self._cache.pop(k, None)
+    def cache_stats(self) -> Dict[str, int]:
+        return self._cache.stats()
 
-    def trim_cache(self):
-        with self._lock:
-            self._trim_cache()
+    def cached(self, path: str) -> TokenResult | None:
+        return self._cache.peek(path)
 
-    def _estimate_tokens(self, size: int) -> int:
-        return max(1, size // _APPROX_DIVISOR)
+    def _spec(self) -> List:
+        name, enc = tokenizer_spec()
+        return ["tiktoken" if name == "auto" else name, enc]
 
-    def _process(self, path: str, cb: Callable[[str, int], None], force: bool):
+    def save_cache(self, file_path: str) -> int:
+        rows = [[p, *k, r.count, r.kind] for p, k, r in self._cache.items() if not r.approx]
         try:
-            st = os.stat(path)
-            mtime = st.st_mtime
-            if not self._should_read(path, mtime, force):
-                cb(path, self._cache[path]["count"])
+            dir_path = os.path.dirname(os.path.abspath(file_path)) or "."
+            os.makedirs(dir_path, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", delete=False, dir=dir_path, encoding="utf-8") as tmp:
+                json.dump({"spec": self._spec(), "entries": rows}, tmp, separators=(",", ":"))
+                tmp_path = tmp.name
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            log("TOKEN_CACHE_SAVE_FAIL", file_path, e, level=30)
+            return 0
+        log("TOKEN_CACHE_SAVED", len(rows), "entries")
+        return len(rows)
+
+    def load_cache(self, file_path: str) -> int:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            log("TOKEN_CACHE_LOAD_FAIL", file_path, e, level=30)
+            return 0
+        if data.get("spec") != self._spec():
+            return 0
+        n = 0
+        for p, size, mtime, ino, cnt, kind in data.get("entries", ())[-_MAX_CACHE:]:
+            if self._cache.peek(p) is None:
+                self._cache.put(p, (size, mtime, ino), TokenResult(cnt, kind=kind))
+                n += 1
+        log("TOKEN_CACHE_LOADED", n, "entries")
+        return n
+
+    def _estimate_tokens(self, path: str, size: int) -> Tuple[int, int, bool]:
+        try:
+            return estimate_tokens_sampled(path)
+        except Exception as e:
+            log("TOKEN_SAMPLE_FAIL", path, e, level=30)
+            return max(1, size // _APPROX_DIVISOR), size // _APPROX_DIVISOR, False
+
+    def _count_large(self, path: str, cb: TokenCallback, key: StatKey):
+        try:
+            exact = get_tokenizer().exact
+            cnt = count_tokens_streaming(path)
+            if stat_key(os.stat(path)) != key:
                 return
-            size = st.st_size
-            if size > _FAST_THRESHOLD:
-                cnt = self._estimate_tokens(size)
-            else:
-                with open(path, "r", encoding="utf-8", errors="ignore", newline="") as f:
-                    cnt = count_tokens(f.read())
+            res = TokenResult(cnt, not exact)
             with self._lock:
-                self._cache[path] = {"count": cnt, "mtime": mtime}
-                self._trim_cache()
-            cb(path, cnt)
+                self._store(path, cb, key, res)
+            cb(path, res)
+            if not exact and get_tokenizer().exact:
+                self.upgrade()
         except FileNotFoundError:
+            pass
+        except Exception as e:
+            log("TOKEN_STREAM_FAIL", path, e, level=40)
+        finally:
+            with self._lock:
+                self._large_pending.discard(path)
+
+    def _queue_large(self, path: str, cb: TokenCallback, key: StatKey, size: int):
+        with self._lock:
+            if not get_tokenizer().exact:
+                self._upgrade[path] = cb
+                return
+            if path in self._large_pending or size > _EXACT_LIMIT:
+                return
+            self._large_pending.add(path)
+            self._large_q.append((path, cb, key))
+            if self._large_busy:
+                return
+            self._large_busy = True
+        scheduler.submit(self._run_large, priority=BACKGROUND)
+
+    def _run_large(self):
+        while True:
+            with self._lock:
+                if not self._large_q:
+                    self._large_busy = False
+                    return
+                path, cb, key = self._large_q.popleft()
+            self._count_large(path, cb, key)
+
+    def _take(self) -> List[Tuple[str, TokenCallback, bool, StatKey | None]]:
+        with self._lock:
+            batch = []
+            for q in self._pending:
+                while q and len(batch) < _BATCH_FILES:
+                    batch.append(q.popleft())
+            if not batch:
+                self._drainers -= 1
+            return batch
+
+    def _drain(self):
+        batch = self._take()
+        if not batch:
+            return
+        try:
+            self._process_batch(batch)
+        except Exception as e:
+            log("TOKEN_BATCH_FAIL", len(batch), e, level=40)
+        scheduler.submit(self._drain, priority=self._top())
+
+    def _top(self) -> int:
+        return next((p for p, q in enumerate(self._pending) if q), BACKGROUND)
+
+    def _store(self, path: str, cb: TokenCallback, key: StatKey, res: TokenResult):
+        self._cache.put(path, key, res)
+        if res.approx and res.kind == TEXT:
+            self._upgrade[path] = cb
+
+    def _count(self, texts: List[str], items: List[Tuple[str, TokenCallback, StatKey]], remote: bool) -> Tuple[List[Tuple[int, str]], bool]:
+        if not remote:
+            exact = get_tokenizer().exact
+            return [(c, TEXT) for c in count_tokens_batch(texts, self._threads)], exact
+        paths = [p for p, _, _ in items]
+        try:
+            return self._process_pool().submit(_count_paths, paths).result()
+        except Exception as e:
+            log("TOKEN_PROCESS_FAIL", e, level=40)
+            self._engine = "thread"
             with self._lock:
-                self._cache.pop(path, None)
-            cb(path, 0)
+                pool, self._proc_pool = self._proc_pool, None
+            if pool is not None:
+                pool.shutdown(wait=False)
+            return _count_paths(paths)
+
+    def _flush(self, texts: List[str], items: List[Tuple[str, TokenCallback, StatKey]], remote: bool):
+        if not items:
+            return
+        try:
+            counted, exact = self._count(texts, items, remote)
         except Exception as e:
-            log("TOKEN_READ_FAIL", path, e, level=40)
-            cb(path, 0)
+            log("TOKEN_FLUSH_FAIL", len(items), e, level=40)
+            for path, cb, _ in items:
+                cb(path, TokenResult(0))
+            return
+        results = [TokenResult(cnt, kind != BINARY and (kind != TEXT or not exact), kind=kind) for cnt, kind in counted]
+        with self._lock:
+            for (path, cb, key), res in zip(items, results):
+                self._store(path, cb, key, res)
+                remember(path, key[1], res.kind)
+        for (path, cb, _), res in zip(items, results):
+            cb(path, res)
+        if not exact and get_tokenizer().exact:
+            self.upgrade()
 
-    def queue_token_count(self, path: str, cb: Callable[[str, int], None], force_update: bool = False):
+    def _process_batch(self, batch: List[Tuple[str, TokenCallback, bool, StatKey | None]]):
+        remote = self._use_processes(self._backlog() + len(batch))
+        texts: List[str] = []
+        items: List[Tuple[str, TokenCallback, StatKey]] = []
+        size_sum = 0
+        for path, cb, force, known in batch:
+            try:
+                key = known or stat_key(os.stat(path))
+                size = key[0]
+                hit = None if force else self._cache.get(path, key)
+                if hit is not None:
+                    cb(path, hit)
+                    if hit.approx and hit.kind == TEXT:
+                        self._queue_large(path, cb, key, size)
+                    continue
+                if size > _FAST_THRESHOLD:
+                    kind = classify(path, key[1])
+                    if kind == TEXT:
+                        exact = get_tokenizer().exact
+                        cnt, bound, full = self._estimate_tokens(path, size)
+                        full = full and exact
+                    else:
+                        cnt, bound, full = _sniffed_count(kind, size), 0, kind == BINARY
+                    res = TokenResult(cnt, not full, bound, kind)
+                    with self._lock:
+                        self._store(path, cb, key, res)
+                    cb(path, res)
+                    if kind == TEXT and not full:
+                        self._queue_large(path, cb, key, size)
+                    continue
+                if not remote:
+                    kind, text, size = _read_sniffed(path)
+                    if text is None:
+                        res = TokenResult(_sniffed_count(kind, size), kind != BINARY, kind=kind)
+                        remember(path, key[1], kind)
+                        with self._lock:
+                            self._store(path, cb, key, res)
+                        cb(path, res)
+                        continue
+                    texts.append(text)
+                items.append((path, cb, key))
+                size_sum += size
+                if size_sum >= _BATCH_BYTES:
+                    self._flush(texts, items, remote)
+                    texts, items, size_sum = [], [], 0
+            except FileNotFoundError:
+                self._cache.pop(path)
+                cb(path, TokenResult(0))
+            except Exception as e:
+                log("TOKEN_READ_FAIL", path, e, level=40)
+                cb(path, TokenResult(0))
+        self._flush(texts, items, remote)
+
+    def queue_token_count(self, path: str, cb: TokenCallback, force_update: bool = False,
+                          key: StatKey | None = None, priority: int = VISIBLE):
         if not self._started:
             self.start()
-        if self._pool:
-            self._pool.submit(self._process, path, cb, force_update)
+        with self._lock:
+            self._pending[priority].append((path, cb, force_update, key))
+            if self._drainers >= self._slots():
+                return
+            self._drainers += 1
+        scheduler.submit(self._drain, priority=priority)
+
+    def upgrade(self):
+        with self._lock:
+            items, self._upgrade = self._upgrade, {}
+        if items:
+            log("TOKEN_UPGRADE", len(items), "file(s)")
+        for path, cb in items.items():
+            self.queue_token_count(path, cb, force_update=True, priority=BACKGROUND)
+
+class TokenUpdateQueue:
+    def __init__(self):
+        self._q: Deque[Tuple[str, TokenResult]] = deque()
+
+    def __len__(self) -> int:
+        return len(self._q)
+
+    def push(self, path: str, res: TokenResult):
+        self._q.append((path, res))
+
+    def apply(self, path_to_node) -> bool:
+        q = self._q
+        latest: Dict[str, TokenResult] = {}
+        for _ in range(len(q)):
+            path, res = q.popleft()
+            latest[path] = res
+        changed = False
+        for path, res in latest.items():
+            node = path_to_node.get(path)
+            if node is not None and update_node_token_count(node, res):
+                changed = True
+        return changed
 
 token_count_manager = TokenCountManager()
 
-def update_node_token_count(node, new: int) -> bool:
-    if node.is_dir or node.token_count == new:
+token_updates = TokenUpdateQueue()
+
+on_tokenizer_ready(token_count_manager.upgrade)
+
+def update_node_token_count(node, res: TokenResult) -> bool:
+    if node.is_dir:
         return False
+    approx_changed = node.token_approx != res.approx or node.kind != res.kind or node.token_bound != res.bound
+    node.token_approx = res.approx
+    node.token_bound = res.bound
+    node.kind = res.kind
+    new = res.count
+    if node.token_count == new:
+        return approx_changed
     delta = new - node.token_count
     if delta == 0:
         return False
@@ -35,6 +35,18 @@ def flatten_tree(
             last = idx == total - 1
             yield from flatten_tree(child, stack + [last], visited, False)
 
+def ancestor_stack(node: TreeNode) -> List[bool]:
+    stack = []
+    cur = node
+    while cur.parent is not None:
+        stack.append(cur.parent.children[-1] is cur if cur.parent.children else True)
+        cur = cur.parent
+    stack.reverse()
+    return stack
+
+def flatten_subtree(node: TreeNode) -> List[Tuple[TreeNode, str, bool]]:
+    return list(flatten_tree(node, ancestor_stack(node), None, node.parent is None))
+
 def toggle_node(node: TreeNode) -> None:
     if node.is_dir:
         node.expanded = not node.expanded
@@ -1,7 +1,15 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import List
+from typing import Callable, List, Optional
+from core.utils.scheduler import INTERACTIVE, CancelToken, scheduler
 from .ops import refactor_file
 
-def refactor_files(files: List[str], max_workers: int = 8):
-    with ThreadPoolExecutor(max_workers=max_workers) as pool:
-        list(pool.map(refactor_file, files))
+def refactor_files(files: List[str], token: CancelToken | None = None, progress: Optional[Callable[[], None]] = None) -> int:
+    futs = [scheduler.submit(refactor_file, f, priority=INTERACTIVE, token=token) for f in files]
+    done = 0
+    for fut in futs:
+        try:
+            done += 1 if scheduler.result(fut) else 0
+        except Exception:
+            pass
+        if progress:
+            progress()
+    return done
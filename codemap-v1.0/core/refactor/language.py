@@ -1,15 +1,15 @@
 import os, re
-from pygments import lex
-from pygments.lexers import get_lexer_by_name, guess_lexer
-from pygments.token import Token
 
 def get_lexer(language: str, source: str):
+    from pygments.lexers import get_lexer_by_name, guess_lexer
     try:
         return get_lexer_by_name(language)
     except:
         return guess_lexer(source)
 
 def filter_tokens(source: str, lexer):
+    from pygments import lex
+    from pygments.token import Token
     return "".join(v for t, v in lex(source, lexer) if t not in Token.Comment and t not in Token.Literal.String.Doc)
 
 def remove_extra_whitespace(code: str):
@@ -1,8 +1,9 @@
 from __future__ import annotations
-import concurrent.futures, re
+import re
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 from config.constants import CLEANUP_OPTIONS, CLEANUP_PATTERNS
+from core.utils.scheduler import INTERACTIVE, CancelToken, scheduler
 from .language import determine_language, strip_comments_and_docstrings
 
 _SUPPORTED_EXTENSIONS = {
@@ -133,14 +134,13 @@ def refactor_directory(
     directory_path: str,
     patterns: Optional[List[str]] = None,
     opts: Optional[Dict[str, Any]] = None,
-    max_workers: int = 8,
+    token: Optional[CancelToken] = None,
 
 ):
     root = Path(directory_path)
     if not root.is_dir():
         return False
     files = [p for p in root.rglob("*") if _should_refactor(p)]
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
-        list(pool.map(refactor_file, files))
+    scheduler.map(refactor_file, files, priority=INTERACTIVE, token=token)
     cleanup_after_refactor(directory_path, patterns, opts)
     return True
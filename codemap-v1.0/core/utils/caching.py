@@ -1,6 +1,7 @@
+import os
 from collections import OrderedDict,deque
 from threading import Lock
-from typing import TypeVar,Optional,Generic,Tuple,List
+from typing import TypeVar,Optional,Generic,Tuple,List,Dict,Callable
 
 K=TypeVar("K")
 
@@ -44,3 +45,83 @@ class LRUCache(Generic[K,V]):
 
     def items(self)->List[Tuple[K,V]]:
         with self._lock:return list(self._cache.items())
+
+StatKey=Tuple[int,int,int]
+
+def stat_key(st:os.stat_result)->StatKey:
+    return (st.st_size,st.st_mtime_ns,st.st_ino)
+
+class StatCache(Generic[V]):
+    ENTRY_OVERHEAD=160
+
+    def __init__(self,max_entries:int=100_000,max_bytes:int=64<<20,cost:Optional[Callable[[str,V],int]]=None):
+        self.max_entries=max_entries
+        self.max_bytes=max_bytes
+        self._cost=cost
+        self._cache:OrderedDict[str,Tuple[StatKey,V,int]]=OrderedDict()
+        self._bytes=0
+        self._lock=Lock()
+        self.hits=self.misses=self.stale=self.evictions=0
+
+    def _size(self,path:str,val:V)->int:
+        return self.ENTRY_OVERHEAD+len(path)+(self._cost(path,val) if self._cost else 0)
+
+    def _evict(self)->None:
+        while self._cache and (len(self._cache)>self.max_entries or self._bytes>self.max_bytes):
+            _,(_,_,c)=self._cache.popitem(last=False)
+            self._bytes-=c
+            self.evictions+=1
+
+    def get(self,path:str,key:StatKey)->Optional[V]:
+        with self._lock:
+            hit=self._cache.get(path)
+            if hit is None:
+                self.misses+=1
+                return None
+            if hit[0]!=key:
+                self.stale+=1
+                return None
+            self._cache.move_to_end(path)
+            self.hits+=1
+            return hit[1]
+
+    def peek(self,path:str)->Optional[V]:
+        with self._lock:
+            hit=self._cache.get(path)
+            return hit[1] if hit else None
+
+    def put(self,path:str,key:StatKey,val:V)->None:
+        c=self._size(path,val)
+        with self._lock:
+            old=self._cache.pop(path,None)
+            if old:self._bytes-=old[2]
+            self._cache[path]=(key,val,c)
+            self._bytes+=c
+            self._evict()
+
+    def pop(self,path:str)->Optional[V]:
+        with self._lock:
+            old=self._cache.pop(path,None)
+            if old is None:return None
+            self._bytes-=old[2]
+            return old[1]
+
+    def items(self)->List[Tuple[str,StatKey,V]]:
+        with self._lock:return [(p,k,v) for p,(k,v,_) in self._cache.items()]
+
+    def trim(self)->None:
+        with self._lock:self._evict()
+
+    def clear(self)->None:
+        with self._lock:
+            self._cache.clear();self._bytes=0
+
+    def stats(self)->Dict[str,int]:
+        with self._lock:
+            return {"entries":len(self._cache),"bytes":self._bytes,"hits":self.hits,"misses":self.misses,"stale":self.stale,"evictions":self.evictions}
+
+    def __contains__(self,path:str)->bool:
+        with self._lock:return path in self._cache
+
+    def __len__(self)->int:
+        with self._lock:return len(self._cache)
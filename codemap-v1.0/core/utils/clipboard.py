@@ -1,17 +1,27 @@
-import os, sys, subprocess, threading, time, functools, concurrent.futures, re, tempfile
-from dataclasses import dataclass
+import os, threading, time, functools, concurrent.futures, re, tempfile, itertools
 from pathlib import Path
-from typing import List, Tuple, Optional, Set, Iterable
+from collections import deque
+from typing import Callable, Deque, Dict, Iterator, List, Tuple, Optional, Set, Iterable, Mapping, Union
 
-from config.constants import COPY_FORMAT_PRESETS, get_cli_refresh_interval, count_tokens
+from config.constants import COPY_FORMAT_PRESETS, get_cli_refresh_interval
 from core.refactor.language import determine_language
-from core.utils.caching import LRUCache
+from core.utils.caching import LRUCache, StatCache, StatKey, stat_key
+from core.utils.clipboard_backends import get_backend
 from core.utils.debug import log
+from core.utils.scheduler import INTERACTIVE, CancelToken, scheduler
 
-@dataclass(frozen=True)
 class Segment:
-    path: str
-    body: str
+    __slots__ = ("path", "start", "end", "_buf")
+
+    def __init__(self, path: str, buf: str, start: int = 0, end: Optional[int] = None):
+        self.path = path; self._buf = buf; self.start = start; self.end = len(buf) if end is None else end
+
+    @property
+    def body(self) -> str:
+        return self._buf[self.start:self.end]
+
+    def __repr__(self) -> str:
+        return f"Segment({self.path!r}, {self.start}, {self.end})"
 
 MAX_SEG          = 5_000
 
@@ -21,14 +31,32 @@ _VALID_TRIM      = 4_096
 
 _SEG_TRIM        = 32
 
+_READ_AHEAD      = 32
+
+_READ_BATCH      = 16
+
+_FRAGMENT_BYTES  = 64 << 20
+
+_FRAGMENT_FILES  = 20_000
+
+_POLL_MAX        = 2.0
+
+_POLL_BACKOFF    = 1.5
+
+_FP_FULL         = 64 << 10
+
+_FP_EDGE         = 4096
+
+_FP_WINDOWS      = 16
+
+_FP_WINDOW       = 256
+
 _norm  = functools.lru_cache(8192)(lambda p: os.path.normpath(p.replace("\\", os.sep).replace("/", os.sep)))
 
 _abs   = functools.lru_cache(8192)(os.path.abspath)
 
 _case  = functools.lru_cache(8192)(os.path.normcase)
 
-_SEG_RE = re.compile(r'([^\r\n]+)\r?\n\s*```[^\r\n]*\r?\n(.*?)\r?\n\s*```', re.S)
-
 _DELIM_PATTERN = re.compile(r'^(?P<rune>\W)\1{2,}$')
 
 _LANG_LINE_RE = re.compile(r'^[A-Za-z0-9_+.#-]{1,32}$')
@@ -39,58 +67,74 @@ _KNOWN_LANGS: Set[str] = {
 
 }
 
-def _system_clipboard() -> str:
-    if sys.platform.startswith("win"):
-        try: return subprocess.check_output("powershell Get-Clipboard", shell=True).decode("latin-1","ignore")
-        except: return ""
-    if sys.platform.startswith("darwin"):
-        try: return subprocess.check_output(["pbpaste"]).decode("latin-1")
-        except: return ""
-    try: return subprocess.check_output(["xclip","-selection","clipboard","-o"]).decode("latin-1")
-    except: return ""
-
-def _robust_split(text: str) -> List[Segment]:
-    out: List[Segment] = []
-    lines = text.splitlines()
-    i = 0
-    while i < len(lines) and len(out) < MAX_SEG:
-        while i < len(lines) and not lines[i].strip(): i += 1
-        if i >= len(lines): break
-        path = _norm(lines[i].strip()); i += 1
-        while i < len(lines) and not lines[i].strip(): i += 1
-        if i >= len(lines):
-            out.append(Segment(path, ""))
-            break
-        body: List[str] = []
-        start_line = lines[i]; i += 1
-        if start_line.startswith("```"):
-            fence = "```"
-            while i < len(lines) and not lines[i].strip().startswith(fence):
-                body.append(lines[i]); i += 1
-            if i < len(lines): i += 1
+_BLANKS = re.compile(r'(?:[ \t\r]*\n)*')
+
+_FENCED = re.compile(r'([^\n]*)\n[ \t]*```([^\n]*)\n(.*?)^[ \t]*```[ \t]*\r?$\n?', re.S | re.M)
+
+def _line(buf: str, pos: int) -> Tuple[str, int]:
+    nl = buf.find("\n", pos)
+    return (buf[pos:], len(buf)) if nl < 0 else (buf[pos:nl], nl + 1)
+
+_close = functools.lru_cache(64)(lambda f: re.compile(r'^[ \t]*' + re.escape(f) + r'[ \t]*\r?$', re.M))
+
+def _fence_path(info: str, pending: Optional[str]) -> Optional[str]:
+    parts = info.split(None, 1)
+    if len(parts) == 2: return parts[1].strip()
+    if pending is not None: return pending
+    if parts and parts[0].lower() not in _KNOWN_LANGS and ("." in parts[0] or "/" in parts[0] or "\\" in parts[0]): return parts[0]
+    return None
+
+def _block_path(p: str, fence: str) -> str:
+    return p[:-1].rstrip() if fence == '"""' and p.endswith(":") and len(p) > 1 else p
+
+def iter_segments(buf: str) -> Iterator[Segment]:
+    pos, n, pending = 0, len(buf), None
+    while pos < n:
+        if pending is None:
+            pos = _BLANKS.match(buf, pos).end(); m = None if buf.startswith("```", pos) else _FENCED.match(buf, pos)
+            head = m[1].strip() if m is not None else ""
         else:
-            m = _DELIM_PATTERN.match(start_line.strip())
-            if m:
-                fence = m.group(0)
-                while i < len(lines) and not lines[i].strip(): i += 1
-                if i < len(lines) and _LANG_LINE_RE.fullmatch(lines[i].strip()) and lines[i].strip().lower() in _KNOWN_LANGS:
-                    i += 1
-                while i < len(lines) and not lines[i].strip(): i += 1
-                while i < len(lines):
-                    if _DELIM_PATTERN.match(lines[i].strip()):
-                        i += 1; break
-                    body.append(lines[i]); i += 1
-            else:
-                body.append(start_line)
-                while i < len(lines) and lines[i]:
-                    body.append(lines[i]); i += 1
-        out.append(Segment(path, "\n".join(body)))
-    return out
+            head = ""
+        if head and not head.startswith("```"):
+            body, end = m.span(3); pos = m.end()
+            if end > body and buf[end - 1] == "\n": end -= 1
+            if end > body and buf[end - 1] == "\r": end -= 1
+            yield Segment(_norm(_fence_path(m[2], head)), buf, body, end)
+            continue
+        start = pos; raw, pos = _line(buf, pos); line = raw.strip()
+        if not line: continue
+        if line.startswith("```"):
+            path, fence = _fence_path(line[3:], pending), "```"
+        elif pending is not None and _DELIM_PATTERN.match(line):
+            path, fence = _block_path(pending, line), line
+        elif pending is None:
+            pending = line; continue
+        else:
+            last = start + len(raw.rstrip("\r"))
+            while pos < n:
+                s2 = pos; raw, pos = _line(buf, pos)
+                if not raw.strip(): break
+                last = s2 + len(raw.rstrip("\r"))
+            yield Segment(_norm(pending), buf, start, last); pending = None
+            continue
+        pending = None; body = pos
+        while fence != "```" and pos < n:
+            raw, nxt = _line(buf, pos); text = raw.strip()
+            if text and not (_LANG_LINE_RE.fullmatch(text) and text.lower() in _KNOWN_LANGS): break
+            pos = body = nxt
+            if text: break
+        m = _close(fence).search(buf, body)
+        end, pos = (m.start(), min(m.end() + 1, n)) if m else (n, n)
+        if end > body and buf[end - 1] == "\n": end -= 1
+        if end > body and buf[end - 1] == "\r": end -= 1
+        if path is None: continue
+        yield Segment(_norm(path), buf, body, max(end, body))
+    if pending is not None:
+        yield Segment(_norm(pending), "")
 
 def _parse(buf: str) -> List[Segment]:
     if not buf: return []
-    fast = [Segment(_norm(p).strip(), c) for p, c in _SEG_RE.findall(buf)]
-    return fast[:MAX_SEG] if fast else _robust_split(buf)
+    return list(itertools.islice(iter_segments(buf), MAX_SEG))
 
 def _clean_body(body: str, path: str) -> str:
     if not body: return ""
@@ -107,11 +151,18 @@ def _clean_body(body: str, path: str) -> str:
     cleaned = "\n".join(lines[start:end]).rstrip() + "\n"
     return cleaned
 
+def _fingerprint(txt: str) -> Tuple[int, int]:
+    n = len(txt)
+    if n <= _FP_FULL: return n, hash(txt)
+    step = (n - 2 * _FP_EDGE) // _FP_WINDOWS
+    mid = "".join(txt[_FP_EDGE + i * step:_FP_EDGE + i * step + _FP_WINDOW] for i in range(_FP_WINDOWS))
+    return n, hash((txt[:_FP_EDGE], mid, txt[-_FP_EDGE:]))
+
 class _Clip:
-    __slots__ = ("raw","ts","segments","base","abs_root","rel_root")
+    __slots__ = ("raw","ts","fp","version","segments","base","abs_root","rel_root")
 
     def __init__(self):
-        self.raw = ""; self.ts = 0.0; self.segments: List[Segment] = []
+        self.raw = ""; self.ts = 0.0; self.fp = _fingerprint(""); self.version = 0; self.segments: List[Segment] = []
         self.base: Set[str] = set(); self.abs_root = None; self.rel_root = None
 
     def _analyse(self):
@@ -125,16 +176,28 @@ class _Clip:
             tops = {p.split(os.sep)[0] for p in rels if p}
             self.rel_root = tops.pop() if len(tops) == 1 else None; self.abs_root = None
 
-    def update(self, txt: str):
-        self.raw = txt; self.ts = time.perf_counter()
-        self.segments = _parse(txt)[:MAX_SEG]; self._analyse()
+    def update(self, txt: str, fp: Optional[Tuple[int, int]] = None):
+        self.raw = txt; self.ts = time.perf_counter(); self.fp = fp or _fingerprint(txt)
+        self.segments = _parse(txt); self._analyse(); self.version += 1
+
+    def restore(self, txt: str, fp: Tuple[int, int], parsed: tuple):
+        self.raw, self.ts, self.fp = txt, time.perf_counter(), fp
+        self.segments, self.base, self.abs_root, self.rel_root = parsed; self.version += 1
 
 _clip = _Clip()
 
 _SEG_CACHE, _dest_cache, _valid_cache = LRUCache(128), LRUCache(4096), LRUCache(8192)
 
+_FRAGMENTS: StatCache[str] = StatCache(_FRAGMENT_FILES, _FRAGMENT_BYTES, cost=lambda _p, v: len(v))
+
 def trim_caches():
-    _dest_cache.prune(_DEST_TRIM); _valid_cache.prune(_VALID_TRIM); _SEG_CACHE.prune(_SEG_TRIM)
+    _dest_cache.prune(_DEST_TRIM); _valid_cache.prune(_VALID_TRIM); _SEG_CACHE.prune(_SEG_TRIM); _FRAGMENTS.trim()
+
+def fragment_cache_stats():
+    return _FRAGMENTS.stats()
+
+def clipboard_version() -> int:
+    return _clip.version
 
 def get_clipboard_segments() -> List[Tuple[str,str]]:
     return [(s.path, s.body) for s in _clip.segments]
@@ -170,35 +233,90 @@ def _dir_scope(base: str) -> bool:
         return False
     return True
 
+class PasteIndex:
+    __slots__ = ("version","base","root","segs","exact","tails","depth","relative","abs_dirs","dests","targets","dirs","_found")
+
+    def __init__(self, segs: List[Segment], version: int, root: Optional[str] = None):
+        self.version = version; self.base = root; self.root = _case(_abs(root)) if root else None; self.segs = segs
+        self.exact: Dict[str, List[int]] = {}; self.tails: Dict[Tuple[str, ...], List[int]] = {}; self.depth = 0
+        self.relative = False; self.abs_dirs: Set[str] = set(); self._found: Dict[str, Optional[Segment]] = {}
+        self.dests: List[Tuple[str, Segment]] = []; self.targets: Set[str] = set(); self.dirs: Set[str] = set()
+        for n, s in enumerate(segs):
+            if os.path.isabs(s.path):
+                c = _case(_abs(s.path)); self.exact.setdefault(c, []).append(n); self.abs_dirs.update(_ancestors(os.path.dirname(c)))
+            elif s.path:
+                self.relative = True; parts = tuple(_case(s.path).split(os.sep)); self.depth = max(self.depth, len(parts))
+                for i in range(max(1, len(parts) - 1)): self.tails.setdefault(parts[i:], []).append(n)
+            if self.root: self._land(s)
+
+    def _land(self, s: Segment):
+        d = _dest(self.base, s.path)
+        if not d: return
+        c = _case(_abs(d)); self.dests.append((d, s)); self.targets.add(c)
+        a = os.path.dirname(c)
+        while a not in self.dirs and (a == self.root or a.startswith(self.root + os.sep)):
+            self.dirs.add(a); a = os.path.dirname(a)
+
+    @staticmethod
+    def _lands(s: Segment, c: str) -> bool:
+        for a in _ancestors(os.path.dirname(c)):
+            r = _dest(a, s.path)
+            if r and _case(_abs(r)) == c: return True
+        return False
+
+    def lookup(self, p: str) -> Optional[Segment]:
+        c = _case(_abs(p))
+        if c in self._found: return self._found[c]
+        cand = list(self.exact.get(c, ())); parts = c.split(os.sep)
+        for k in range(min(self.depth, len(parts) - 1), 0, -1): cand.extend(self.tails.get(tuple(parts[-k:]), ()))
+        hit = next((self.segs[n] for n in sorted(set(cand)) if os.path.isabs(self.segs[n].path) or self._lands(self.segs[n], c)), None)
+        self._found[c] = hit; return hit
+
+    def receives(self, p: str, is_dir: bool) -> bool:
+        return _case(_abs(p)) in self.dirs if is_dir else self.lookup(p) is not None
+
+_index: Optional[PasteIndex] = None
+
+_index_lock = threading.Lock()
+
+_paste_root: Optional[str] = None
+
+def set_paste_root(root: Optional[str]):
+    global _paste_root
+    _paste_root = root
+
+def paste_index() -> PasteIndex:
+    global _index
+    idx = _index
+    if idx is not None and idx.version == _clip.version and idx.base == _paste_root: return idx
+    with _index_lock:
+        idx = _index; v = _clip.version; root = _paste_root
+        if idx is None or idx.version != v or idx.base != root:
+            t = time.perf_counter(); idx = _index = PasteIndex(_clip.segments, v, root)
+            log("PASTE_INDEX", len(idx.exact) + len(idx.tails), "keys", len(idx.targets), "targets", f"{(time.perf_counter() - t) * 1000.0:.1f}ms")
+    return idx
+
 def has_valid_paste(p: str, is_dir: bool) -> bool:
-    key = (_case(_abs(p)), is_dir, _clip.ts); hit = _valid_cache.get(key)
+    idx = paste_index()
+    if not is_dir: return idx.lookup(p) is not None
+    key = (_case(_abs(p)), idx.version); hit = _valid_cache.get(key)
     if hit is not None: return hit
-    b = _abs(p); segs = _clip.segments
-    if not segs:
-        _valid_cache.put(key, False); return False
-    if is_dir:
-        if not _dir_scope(b):
-            _valid_cache.put(key, False); return False
-        ok = any(_dest(b, s.path) for s in segs); _valid_cache.put(key, ok); return ok
-    target = _case(_abs(p))
-    if os.path.basename(target) not in _clip.base:
-        _valid_cache.put(key, False); return False
-    for s in segs:
-        if os.path.isabs(s.path) and _case(_abs(s.path)) == target:
-            _valid_cache.put(key, True); return True
-        for a in _ancestors(os.path.dirname(target)):
-            if _dest(a, s.path) == target:
-                _valid_cache.put(key, True); return True
-    _valid_cache.put(key, False); return False
-
-def _write_atomic(dst: str, body: str) -> bool:
+    ok = (idx.relative or key[0] in idx.abs_dirs) and _dir_scope(_abs(p)); _valid_cache.put(key, ok); return ok
+
+def _write_atomic(dst: str, body: str, known: Optional[StatKey] = None) -> bool:
     try:
         data = body.encode("latin-1", "replace")
         dirp = os.path.dirname(dst) or "."
+        if known is None:
+            try: size = os.stat(dst).st_size
+            except FileNotFoundError: size = -1
+        else: size = known[0]
+        if size == len(data):
+            try:
+                with open(dst,"rb") as f:
+                    if f.read() == data: return True
+            except FileNotFoundError: pass
         Path(dirp).mkdir(parents=True, exist_ok=True)
-        if os.path.exists(dst):
-            with open(dst,"rb") as f:
-                if f.read() == data: return True
         with tempfile.NamedTemporaryFile("wb", delete=False, dir=dirp) as tmp:
             tmp.write(data); tmp.flush(); os.fsync(tmp.fileno()); tmpn = tmp.name
         os.replace(tmpn, dst); return True
@@ -209,80 +327,167 @@ def _write_atomic(dst: str, body: str) -> bool:
         log("WRITE_FAILED", dst, e, level=40)
         return False
 
-_WRITER_POOL = concurrent.futures.ThreadPoolExecutor(
-    max_workers=max(4, min(16, os.cpu_count() or 4)),
-    thread_name_prefix="paste"
-
-)
-
-def paste_into(p: str, is_dir: bool, allowed: Optional[Set[str]] = None) -> bool:
-    segs = _clip.segments
+def paste_into(p: str, is_dir: bool, allowed: Optional[Union[Set[str], Mapping[str, Optional[StatKey]]]] = None,
+               token: Optional[CancelToken] = None, progress: Optional[Callable[[], None]] = None) -> bool:
+    idx = paste_index(); segs = _clip.segments
     if not segs: return False
     canon = lambda x: _case(_abs(x))
+    meta = allowed.get if isinstance(allowed, Mapping) else (lambda _k: None)
     if is_dir:
         base = _abs(p); tasks: List[Tuple[str,str]] = []
-        for s in segs:
-            d = _dest(base, s.path)
+        plan = idx.dests if idx.root and canon(base) == idx.root else ((_dest(base, s.path), s) for s in segs)
+        for d, s in plan:
             if not d: continue
             if allowed and canon(d) not in allowed: continue
             tasks.append((d, _clean_body(s.body, d)))
         if not tasks: return False
-        fut = [_WRITER_POOL.submit(_write_atomic, d, b) for d,b in tasks]
-        return any(f.result() for f in fut)
+        fut = [scheduler.submit(_write_atomic, d, b, meta(canon(d)), io=True, priority=INTERACTIVE, token=token) for d,b in tasks]
+        ok = False
+        for f in fut:
+            try: ok = scheduler.result(f) or ok
+            except Exception: pass
+            if progress: progress()
+        return ok
+    s = idx.lookup(p)
+    if s is None: return False
     target = canon(p)
-    for s in segs:
-        if os.path.isabs(s.path) and canon(s.path) == target:
-            return _write_atomic(target, _clean_body(s.body, target))
-        for a in _ancestors(os.path.dirname(target)):
-            r = _dest(a, s.path)
-            if r and canon(r) == target:
-                return _write_atomic(target, _clean_body(s.body, target))
-    return False
+    return _write_atomic(target, _clean_body(s.body, target), meta(target))
 
 def _tpl(p: str, c: str, fmt: str) -> str:
     t = COPY_FORMAT_PRESETS.get(fmt, COPY_FORMAT_PRESETS["optimized"])
     return t.format(path=p, content=c.rstrip() or "<Could not read file>", language=determine_language(p))
 
-def copy_files_subloop(stdscr, files: List[Tuple[str,str]], fmt: str) -> str:
-    outs=[]; chars=toks=0; paths=[]
+def copy_files_subloop(stdscr, files: List[Tuple[str,str]], fmt: str, tokens: int = 0) -> str:
+    outs=[]; chars=0; paths=[]
     for p,c in files:
-        chars+=len(c); toks+=count_tokens(c); paths.append(p); outs.append(_tpl(p,c,fmt))
-    log("COPY",len(files),"file(s)",chars,"chars",toks,"tokens","paths:",",".join(paths))
+        chars+=len(c); paths.append(p); outs.append(_tpl(p,c,fmt))
+    log("COPY",len(files),"file(s)",chars,"chars",tokens,"tokens","paths:",",".join(paths))
     return "\n".join(outs)
 
-def copy_text_to_clipboard(t: str):
+class ClipboardSink:
+    def __init__(self):
+        self._out = get_backend().writer()
+        self._parts: List[str] = []; self.chars = 0
+
+    def write(self, s: str):
+        self._parts.append(s); self.chars += len(s)
+        self._out.write(s)
+
+    def abort(self):
+        self._out.abort()
+
+    def close(self) -> str:
+        try: self._out.close()
+        except Exception as e: log("CLIPBOARD_WRITE_FAILED", e, level=40)
+        t = "".join(self._parts); self._parts = [t]
+        _clip.update(t)
+        return t
+
+def _fragment(disp: str, path: str, fmt: str, read: Callable[[str], str], tag: str = "") -> str:
+    ck = f"{fmt}{tag}\0{disp}\0{path}"
+    try: key = stat_key(os.stat(path))
+    except OSError: key = None
+    if key is not None:
+        hit = _FRAGMENTS.get(ck, key)
+        if hit is not None: return hit
+    frag = _tpl(disp, read(path), fmt)
+    if key is not None: _FRAGMENTS.put(ck, key, frag)
+    return frag
+
+class FileSink:
+    def __init__(self, fp):
+        self._fp = fp; self.chars = 0
+
+    def write(self, s: str):
+        self._fp.write(s); self.chars += len(s)
+
+    def abort(self):
+        try: self._fp.flush()
+        except: pass
+
+    def close(self) -> int:
+        self._fp.flush()
+        return self.chars
+
+def _fragments(batch: List[Tuple[str,str]], fmt: str, read: Callable[[str], str], tag: str) -> List[str]:
+    return [_fragment(d, p, fmt, read, tag) for d, p in batch]
+
+def stream_fragments(files: List[Tuple[str,str]], fmt: str, read: Callable[[str], str], sink,
+                     token: Optional[CancelToken] = None, progress: Optional[Callable[[], None]] = None,
+                     read_ahead: int = _READ_AHEAD, batch: int = 1, tag: str = "") -> int:
+    hits = _FRAGMENTS.hits; starts = iter(range(0, len(files), batch))
+    ahead: Deque[concurrent.futures.Future] = deque()
+    def fill():
+        while len(ahead) < read_ahead:
+            i = next(starts, None)
+            if i is None: return
+            ahead.append(scheduler.submit(_fragments, files[i:i+batch], fmt, read, tag, io=True, priority=INTERACTIVE, token=token))
     try:
-        if sys.platform.startswith("win"):
-            subprocess.Popen("clip", stdin=subprocess.PIPE, shell=True).communicate(t.encode("utf-16le"))
-        elif sys.platform.startswith("darwin"):
-            subprocess.Popen("pbcopy", stdin=subprocess.PIPE).communicate(t.encode())
-        else:
-            subprocess.Popen(["xclip","-selection","clipboard"], stdin=subprocess.PIPE).communicate(t.encode())
-    except: pass
-    _clip.update(t)
-    log("CLIPBOARD UPDATED",len(t),"chars",count_tokens(t),"tokens")
-
-def _refresh():
-    txt = _system_clipboard()
-    if txt == _clip.raw: return
-    h = hash(txt); cached = _SEG_CACHE.get(h)
+        fill(); sep = ""
+        while ahead:
+            fut = ahead.popleft(); fill()
+            frags = scheduler.result(fut)
+            sink.write(sep + "\n".join(frags)); sep = "\n"
+            if progress:
+                for _ in frags: progress()
+    except BaseException:
+        for fut in ahead: fut.cancel()
+        sink.abort(); raise
+    sink.close()
+    return _FRAGMENTS.hits - hits
+
+def copy_files_stream(files: List[Tuple[str,str]], fmt: str, read: Callable[[str], str], tokens: int = 0,
+                      token: Optional[CancelToken] = None, progress: Optional[Callable[[], None]] = None, tag: str = "") -> int:
+    sink = ClipboardSink()
+    hits = stream_fragments(files, fmt, read, sink, token, progress, tag=tag)
+    log("COPY",len(files),"file(s)",hits,"cached",sink.chars,"chars",tokens,"tokens","paths:",",".join(p for p,_ in files))
+    return sink.chars
+
+def copy_text_to_clipboard(t: str):
+    sink = ClipboardSink(); sink.write(t); sink.close()
+    log("CLIPBOARD UPDATED",len(t),"chars")
+
+def _refresh() -> bool:
+    backend = get_backend()
+    if backend.changed() is False: return False
+    txt = backend.read()
+    if txt is None: return False
+    fp = _fingerprint(txt)
+    if fp == _clip.fp: return False
+    cached = _SEG_CACHE.get(fp)
     if cached:
-        _clip.raw, _clip.ts, (_clip.segments,_clip.base,_clip.abs_root,_clip.rel_root) = txt,time.perf_counter(),cached
-        return
-    _clip.update(txt); _SEG_CACHE.put(h, (_clip.segments,_clip.base,_clip.abs_root,_clip.rel_root))
+        _clip.restore(txt, fp, cached)
+        paste_index(); return True
+    _clip.update(txt, fp); _SEG_CACHE.put(fp, (_clip.segments,_clip.base,_clip.abs_root,_clip.rel_root))
+    paste_index(); return True
+
+_poke = threading.Event()
+
+def poke_clipboard():
+    _poke.set()
 
 def _bg():
-    interval = max(get_cli_refresh_interval()*5, 0.1)
+    base = max(get_cli_refresh_interval()*5, 0.1); interval = base
     while True:
+        t = time.perf_counter(); changed = False
         try:
-            _refresh(); _valid_cache.clear(); _dest_cache.clear(); trim_caches()
+            changed = _refresh()
         except: pass
-        time.sleep(interval)
+        interval = base if changed else min(_POLL_MAX, interval * _POLL_BACKOFF)
+        if _poke.wait(interval):
+            _poke.clear(); interval = base
+            time.sleep(max(0.0, t + base - time.perf_counter()))
+
+_watch_started = False
 
-threading.Thread(target=_bg, daemon=True, name="clip_refresh").start()
+def start_clipboard_watch():
+    global _watch_started
+    if _watch_started: return
+    _watch_started = True
+    threading.Thread(target=_bg, daemon=True, name="clip_refresh").start()
 
 __all__ = [
-    "copy_text_to_clipboard","copy_files_subloop","has_valid_paste","paste_into",
-    "get_clipboard_segments","trim_caches"
+    "copy_text_to_clipboard","copy_files_subloop","copy_files_stream","stream_fragments","ClipboardSink","FileSink","has_valid_paste","paste_into",
+    "PasteIndex","paste_index","set_paste_root","get_clipboard_segments","clipboard_version","trim_caches","start_clipboard_watch","poke_clipboard"
 
 ]
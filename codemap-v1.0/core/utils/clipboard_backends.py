@@ -0,0 +1,242 @@
+import os, sys, shutil, subprocess, threading, tempfile, base64
+from typing import List, Optional
+
+from config.constants import CONFIG_DIR
+from core.utils.debug import log
+
+_READ_TIMEOUT = 2.0
+
+def _run(cmd, shell: bool = False) -> Optional[bytes]:
+    try: return subprocess.run(cmd, shell=shell, capture_output=True, timeout=_READ_TIMEOUT).stdout
+    except Exception: return None
+
+class ProcessWriter:
+    def __init__(self, cmd, encoding: str = "utf-8", shell: bool = False, keep: bool = False):
+        self._enc = encoding; self._keep = keep
+        try:
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, shell=shell, start_new_session=keep)
+        except Exception as e:
+            log("CLIPBOARD_WRITER_FAIL", cmd, e, level=30); self._proc = None
+
+    def write(self, s: str):
+        if self._proc is None: return
+        try: self._proc.stdin.write(s.encode(self._enc, "replace"))
+        except Exception: self.abort()
+
+    def abort(self):
+        if self._proc is None: return
+        try: self._proc.kill(); self._proc.wait()
+        except Exception: pass
+        self._proc = None
+
+    def close(self) -> Optional[subprocess.Popen]:
+        if self._proc is None: return None
+        try:
+            self._proc.stdin.close()
+            if not self._keep: self._proc.wait()
+        except Exception: pass
+        return self._proc
+
+class ClipboardBackend:
+    name = "none"
+
+    def read(self) -> Optional[str]: return None
+
+    def writer(self): return _NullWriter()
+
+    def changed(self) -> Optional[bool]: return None
+
+    def owns(self) -> bool: return False
+
+class _NullWriter:
+    def write(self, s: str): pass
+
+    def abort(self): pass
+
+    def close(self): return None
+
+class XclipBackend(ClipboardBackend):
+    name = "xclip"
+
+    def __init__(self):
+        self._owner: Optional[subprocess.Popen] = None
+
+    def read(self) -> Optional[str]:
+        out = _run(["xclip", "-selection", "clipboard", "-o"])
+        return None if out is None else out.decode("latin-1")
+
+    def writer(self):
+        backend = self
+        class _Writer(ProcessWriter):
+            def close(self): backend._owner = super().close()
+        return _Writer(["xclip", "-selection", "clipboard", "-quiet"], keep=True)
+
+    def owns(self) -> bool: return self._owner is not None and self._owner.poll() is None
+
+    def changed(self) -> Optional[bool]: return False if self.owns() else None
+
+class WaylandBackend(ClipboardBackend):
+    name = "wayland"
+
+    def __init__(self):
+        self._dirty = threading.Event(); self._dirty.set(); self._watching = False
+        try: proc = subprocess.Popen(["wl-paste", "--watch", "echo"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except Exception: return
+        self._watching = True
+        threading.Thread(target=self._watch, args=(proc,), daemon=True, name="clip_watch").start()
+
+    def _watch(self, proc: subprocess.Popen):
+        for _ in proc.stdout: self._dirty.set()
+        self._watching = False
+
+    def read(self) -> Optional[str]:
+        self._dirty.clear(); out = _run(["wl-paste", "--no-newline"])
+        return None if out is None else out.decode("latin-1")
+
+    def writer(self): return ProcessWriter(["wl-copy"])
+
+    def changed(self) -> Optional[bool]: return self._dirty.is_set() if self._watching else None
+
+class MacBackend(ClipboardBackend):
+    name = "mac"
+
+    def read(self) -> Optional[str]:
+        out = _run(["pbpaste"])
+        return None if out is None else out.decode("latin-1")
+
+    def writer(self): return ProcessWriter(["pbcopy"])
+
+class WindowsBackend(ClipboardBackend):
+    name = "windows"
+
+    def __init__(self):
+        self._seq = None
+        try:
+            import ctypes
+            self._seq_fn = ctypes.windll.user32.GetClipboardSequenceNumber
+        except Exception: self._seq_fn = None
+
+    def read(self) -> Optional[str]:
+        if self._seq_fn is not None: self._seq = self._seq_fn()
+        out = _run("powershell -NoProfile -Command Get-Clipboard", shell=True)
+        return None if out is None else out.decode("latin-1", "ignore")
+
+    def writer(self): return ProcessWriter("clip", "utf-16le", shell=True)
+
+    def changed(self) -> Optional[bool]: return None if self._seq_fn is None else self._seq_fn() != self._seq
+
+class Osc52Writer:
+    def __init__(self, tmux: bool):
+        self._tmux = tmux; self._buf = b""; self._parts: List[bytes] = []
+
+    def write(self, s: str):
+        data = self._buf + s.encode("utf-8", "replace"); cut = len(data) - len(data) % 3
+        self._parts.append(base64.b64encode(data[:cut])); self._buf = data[cut:]
+
+    def abort(self): self._parts = []
+
+    def close(self):
+        seq = b"\x1b]52;c;" + b"".join(self._parts) + base64.b64encode(self._buf) + b"\x07"
+        if self._tmux: seq = b"\x1bPtmux;\x1b" + seq + b"\x1b\\"
+        try:
+            with open("/dev/tty", "wb", buffering=0) as tty: tty.write(seq)
+        except OSError:
+            sys.stdout.buffer.write(seq); sys.stdout.flush()
+        return None
+
+class Osc52Backend(ClipboardBackend):
+    name = "osc52"
+
+    def writer(self): return Osc52Writer(bool(os.getenv("TMUX")))
+
+    def owns(self) -> bool: return True
+
+    def changed(self) -> Optional[bool]: return False
+
+class FileWriter:
+    def __init__(self, path: str):
+        self._path = path; self._tmp = None; dirp = os.path.dirname(os.path.abspath(path)) or "."
+        try:
+            os.makedirs(dirp, exist_ok=True); self._tmp = tempfile.NamedTemporaryFile("wb", delete=False, dir=dirp)
+        except OSError as e: log("CLIPBOARD_WRITER_FAIL", path, e, level=30)
+
+    def write(self, s: str):
+        if self._tmp is not None: self._tmp.write(s.encode("utf-8", "replace"))
+
+    def abort(self):
+        if self._tmp is None: return
+        self._tmp.close()
+        try: os.unlink(self._tmp.name)
+        except OSError: pass
+        self._tmp = None
+
+    def close(self):
+        if self._tmp is None: return None
+        self._tmp.close(); os.replace(self._tmp.name, self._path); self._tmp = None
+        return None
+
+class FileBackend(ClipboardBackend):
+    name = "file"
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(CONFIG_DIR, "clipboard.txt"); self._key = None
+
+    def _stat(self):
+        try: st = os.stat(self.path)
+        except OSError: return None
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def read(self) -> Optional[str]:
+        self._key = self._stat()
+        try:
+            with open(self.path, "rb") as f: return f.read().decode("latin-1")
+        except OSError: return ""
+
+    def writer(self): return FileWriter(self.path)
+
+    def changed(self) -> Optional[bool]: return self._stat() != self._key
+
+def _auto() -> ClipboardBackend:
+    if sys.platform.startswith("win"): return WindowsBackend()
+    if sys.platform.startswith("darwin"): return MacBackend()
+    if os.getenv("WAYLAND_DISPLAY") and shutil.which("wl-paste"): return WaylandBackend()
+    if os.getenv("DISPLAY") and shutil.which("xclip"): return XclipBackend()
+    if os.getenv("SSH_TTY") or os.getenv("SSH_CONNECTION"): return Osc52Backend()
+    return XclipBackend()
+
+_BACKENDS = {
+    "xclip": XclipBackend, "wayland": WaylandBackend, "mac": MacBackend, "windows": WindowsBackend,
+    "osc52": Osc52Backend, "none": ClipboardBackend,
+
+}
+
+def make_backend(spec: Optional[str] = None) -> ClipboardBackend:
+    spec = spec or os.getenv("CM_CLIPBOARD", "auto"); name, _, arg = spec.partition(":")
+    if name == "file": return FileBackend(arg or None)
+    factory = _BACKENDS.get(name)
+    if factory is not None: return factory()
+    if name != "auto": log("CLIPBOARD_BACKEND_UNKNOWN", spec, level=30)
+    return _auto()
+
+_backend: Optional[ClipboardBackend] = None
+
+_backend_lock = threading.Lock()
+
+def get_backend() -> ClipboardBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend(); log("CLIPBOARD_BACKEND", _backend.name)
+    return _backend
+
+def set_backend(backend: ClipboardBackend) -> ClipboardBackend:
+    global _backend
+    with _backend_lock: _backend = backend
+    return backend
+
+__all__ = [
+    "ClipboardBackend", "XclipBackend", "WaylandBackend", "MacBackend", "WindowsBackend", "Osc52Backend",
+    "FileBackend", "make_backend", "get_backend", "set_backend",
+
+]
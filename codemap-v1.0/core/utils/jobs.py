@@ -0,0 +1,90 @@
+import threading, time
+from typing import Any, Callable, List, Optional
+from core.utils.debug import log
+from core.utils.scheduler import INTERACTIVE, Cancelled, CancelToken, scheduler
+
+class Job:
+    def __init__(self, name: str, key: Any = None, total: int = 0, on_done: Optional[Callable[["Job"], None]] = None):
+        self.name = name
+        self.key = key
+        self.total = total
+        self.done = 0
+        self.token = CancelToken()
+        self.on_done = on_done
+        self.future = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started = time.perf_counter()
+
+    def advance(self, n: int = 1):
+        self.token.check()
+        self.done += n
+
+    @property
+    def finished(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled or isinstance(self.error, Cancelled)
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.token.cancelled and bool(self.result)
+
+    def status(self) -> str:
+        if self.total:
+            return f"{self.name} {min(self.done, self.total)}/{self.total}"
+        return f"{self.name} {self.done}" if self.done else f"{self.name}..."
+
+class JobManager:
+    def __init__(self):
+        self._jobs: List[Job] = []
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, fn: Callable, *args, key: Any = None, total: int = 0,
+               on_done: Optional[Callable[[Job], None]] = None, io: bool = False) -> Optional[Job]:
+        with self._lock:
+            if key is not None and any(j.key == key for j in self._jobs):
+                return None
+            job = Job(name, key, total, on_done)
+            self._jobs.append(job)
+        job.future = scheduler.submit(fn, job, *args, io=io, priority=INTERACTIVE, token=job.token)
+        log("JOB_START", name, total or "")
+        return job
+
+    def active(self) -> List[Job]:
+        with self._lock:
+            return [j for j in self._jobs if not j.finished]
+
+    def cancel(self) -> bool:
+        jobs = self.active()
+        for j in jobs:
+            j.token.cancel()
+        return bool(jobs)
+
+    def reap(self) -> List[Job]:
+        with self._lock:
+            done = [j for j in self._jobs if j.finished]
+            if not done:
+                return done
+            self._jobs = [j for j in self._jobs if not j.finished]
+        for j in done:
+            j.error = j.future.exception()
+            if j.error is None:
+                j.result = j.future.result()
+            elif not isinstance(j.error, Cancelled):
+                log("JOB_FAILED", j.name, j.error, level=40)
+            log("JOB_END", j.name, "cancelled" if j.cancelled else "ok" if j.ok else "failed", f"{(time.perf_counter() - j.started) * 1000.0:.0f}ms")
+        return done
+
+    def status(self) -> str:
+        jobs = self.active()
+        if not jobs:
+            return ""
+        s = jobs[0].status()
+        return f"{s} (+{len(jobs) - 1})" if len(jobs) > 1 else s
+
+job_manager = JobManager()
+
+__all__ = ["Job", "JobManager", "job_manager"]
@@ -0,0 +1,167 @@
+import os, threading, heapq, itertools, time, concurrent.futures
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+INTERACTIVE = 0
+
+VISIBLE = 1
+
+BACKGROUND = 2
+
+PRIORITY_NAMES = ("interactive", "visible", "background")
+
+_IDLE_EXIT = 30.0
+
+class Cancelled(Exception):
+    pass
+
+class CancelToken:
+    def __init__(self):
+        self._ev = threading.Event()
+
+    def cancel(self):
+        self._ev.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._ev.is_set()
+
+    def check(self):
+        if self._ev.is_set():
+            raise Cancelled()
+
+class _Task:
+    __slots__ = ("priority", "seq", "fn", "args", "kw", "fut", "token", "queued", "taken")
+
+    def __init__(self, priority: int, seq: int, fn: Callable, args: tuple, kw: dict, fut: "_Future", token: Optional[CancelToken]):
+        self.priority, self.seq, self.fn, self.args, self.kw, self.fut, self.token = priority, seq, fn, args, kw, fut, token
+        self.queued = time.perf_counter()
+        self.taken = False
+
+    def __lt__(self, other: "_Task") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class _Future(concurrent.futures.Future):
+    def __init__(self, pool: "_Pool"):
+        super().__init__()
+        self.pool = pool
+        self.task: Optional[_Task] = None
+
+class _Pool:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self._heap: List[_Task] = []
+        self._seq = itertools.count()
+        self._cv = threading.Condition()
+        self._threads = 0
+        self._idle = 0
+        self._stats = [dict(submitted=0, done=0, failed=0, cancelled=0, wait_ms=0.0, run_ms=0.0) for _ in PRIORITY_NAMES]
+        self._peak = 0
+
+    def submit(self, fn: Callable, args: tuple, kw: dict, priority: int, token: Optional[CancelToken]) -> concurrent.futures.Future:
+        fut = _Future(self)
+        with self._cv:
+            fut.task = _Task(priority, next(self._seq), fn, args, kw, fut, token)
+            heapq.heappush(self._heap, fut.task)
+            self._stats[priority]["submitted"] += 1
+            self._peak = max(self._peak, len(self._heap))
+            self._cv.notify()
+            if len(self._heap) > self._idle and self._threads < self.workers:
+                self._threads += 1
+                threading.Thread(target=self._worker, daemon=True, name=f"{self.name}_{self._threads}").start()
+        return fut
+
+    def _next(self) -> Optional[_Task]:
+        with self._cv:
+            while True:
+                while self._heap:
+                    task = heapq.heappop(self._heap)
+                    if not task.taken:
+                        task.taken = True
+                        return task
+                self._idle += 1
+                woke = self._cv.wait(_IDLE_EXIT)
+                self._idle -= 1
+                if not woke and not self._heap:
+                    self._threads -= 1
+                    return None
+
+    def steal(self, task: _Task) -> bool:
+        with self._cv:
+            if task.taken:
+                return False
+            task.taken = True
+        self._run(task)
+        return True
+
+    def _run(self, task: _Task):
+        fut, st = task.fut, self._stats[task.priority]
+        if (task.token is not None and task.token.cancelled) or not fut.set_running_or_notify_cancel():
+            if not fut.cancelled():
+                fut.set_exception(Cancelled())
+            with self._cv:
+                st["cancelled"] += 1
+            return
+        start = time.perf_counter()
+        outcome = "done"
+        try:
+            fut.set_result(task.fn(*task.args, **task.kw))
+        except BaseException as e:
+            outcome = "cancelled" if isinstance(e, Cancelled) else "failed"
+            fut.set_exception(e)
+        end = time.perf_counter()
+        with self._cv:
+            st[outcome] += 1
+            st["wait_ms"] += (start - task.queued) * 1000.0
+            st["run_ms"] += (end - start) * 1000.0
+
+    def _worker(self):
+        while True:
+            task = self._next()
+            if task is None:
+                return
+            self._run(task)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cv:
+            out: Dict[str, Any] = dict(workers=self.workers, threads=self._threads, queued=len(self._heap), peak=self._peak)
+            for name, st in zip(PRIORITY_NAMES, self._stats):
+                if st["submitted"]:
+                    out[name] = {k: round(v, 1) if isinstance(v, float) else v for k, v in st.items()}
+            return out
+
+class Scheduler:
+    def __init__(self, cpu_workers: int | None = None, io_workers: int | None = None):
+        n = os.cpu_count() or 4
+        self.cpu = _Pool("cpu", cpu_workers or int(os.getenv("CM_CPU_WORKERS", 0)) or max(2, n - 1))
+        self.io = _Pool("io", io_workers or int(os.getenv("CM_IO_WORKERS", 0)) or min(16, max(4, n)))
+
+    def submit(self, fn: Callable, *args, io: bool = False, priority: int = BACKGROUND,
+               token: Optional[CancelToken] = None, **kw) -> concurrent.futures.Future:
+        return (self.io if io else self.cpu).submit(fn, args, kw, priority, token)
+
+    def result(self, fut: concurrent.futures.Future) -> Any:
+        if isinstance(fut, _Future) and fut.task is not None:
+            fut.pool.steal(fut.task)
+        return fut.result()
+
+    def map(self, fn: Callable, items: Iterable, io: bool = False, priority: int = BACKGROUND,
+            token: Optional[CancelToken] = None) -> List[Any]:
+        futs = [self.submit(fn, it, io=io, priority=priority, token=token) for it in items]
+        out = []
+        for f in futs:
+            try:
+                out.append(self.result(f))
+            except Cancelled:
+                out.append(None)
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {"cpu": self.cpu.stats(), "io": self.io.stats()}
+
+scheduler = Scheduler()
+
+__all__ = [
+    "INTERACTIVE", "VISIBLE", "BACKGROUND", "Cancelled", "CancelToken", "Scheduler", "scheduler",
+
+]
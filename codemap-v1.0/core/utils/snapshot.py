@@ -1,5 +1,9 @@
 import os,shutil,hashlib
+from typing import Callable,Optional
 from config.constants import SNAPSHOT_DIR
+from core.utils.caching import LRUCache
+
+_present:LRUCache[str,bool]=LRUCache(4096)
 
 def _hash_path(p:str)->str:
     return hashlib.sha1(os.path.abspath(p).encode()).hexdigest()
@@ -8,46 +12,66 @@ def _base_dir(p:str)->str:
     return os.path.join(SNAPSHOT_DIR,_hash_path(p))
 
 def has_snapshot(p:str)->bool:
-    return os.path.exists(_base_dir(p))
+    d=_base_dir(p)
+    hit=_present.get(d)
+    if hit is None:
+        hit=os.path.exists(d)
+        _present.put(d,hit)
+    return hit
+
+def _copier(progress:Optional[Callable[[],None]]):
+    if progress is None:
+        return shutil.copy2
+    def _copy(s,d):
+        progress()
+        return shutil.copy2(s,d)
+    return _copy
 
-def save_snapshot(p:str)->bool:
+def save_snapshot(p:str,progress:Optional[Callable[[],None]]=None)->bool:
+    dst=_base_dir(p)
     try:
-        dst=_base_dir(p)
         if os.path.exists(dst):
             shutil.rmtree(dst,ignore_errors=True)
+        _present.put(dst,False)
+        copy=_copier(progress)
         if os.path.isdir(p):
-            shutil.copytree(p,dst)
+            shutil.copytree(p,dst,copy_function=copy)
         else:
             os.makedirs(dst,exist_ok=True)
-            shutil.copy2(p,os.path.join(dst,os.path.basename(p)))
+            copy(p,os.path.join(dst,os.path.basename(p)))
+        _present.put(dst,True)
         return True
     except:
+        shutil.rmtree(dst,ignore_errors=True)
         return False
 
-def _restore_dir(src:str,dst:str):
+def _restore_dir(src:str,dst:str,copy=shutil.copy2):
     for root,dirs,files in os.walk(src):
         rel=os.path.relpath(root,src)
         target=os.path.join(dst,rel) if rel!="." else dst
         os.makedirs(target,exist_ok=True)
         for f in files:
-            shutil.copy2(os.path.join(root,f),os.path.join(target,f))
+            copy(os.path.join(root,f),os.path.join(target,f))
 
-def load_snapshot(p:str)->bool:
+def load_snapshot(p:str,progress:Optional[Callable[[],None]]=None)->bool:
     try:
         src=_base_dir(p)
-        if not os.path.exists(src):
+        if not has_snapshot(p):
             return False
+        copy=_copier(progress)
         if os.path.isdir(p):
-            _restore_dir(src,p)
+            _restore_dir(src,p,copy)
         else:
-            shutil.copy2(os.path.join(src,os.path.basename(p)),p)
+            copy(os.path.join(src,os.path.basename(p)),p)
         return True
     except:
         return False
 
 def delete_snapshot(p:str)->bool:
     try:
-        shutil.rmtree(_base_dir(p),ignore_errors=True)
+        d=_base_dir(p)
+        shutil.rmtree(d,ignore_errors=True)
+        _present.put(d,False)
         return True
     except:
         return False
@@ -0,0 +1,37 @@
+import sys,time
+from typing import List,Tuple
+
+BUDGET_MS=150.0
+
+_t0=time.perf_counter()
+
+_last=_t0
+
+_phases:List[Tuple[str,float]]=[]
+
+enabled=False
+
+def begin(t0:float):
+    global _t0,_last
+    _t0=_last=t0
+
+def enable(on:bool=True):
+    global enabled
+    enabled=on
+
+def mark(phase:str):
+    global _last
+    now=time.perf_counter()
+    _phases.append((phase,(now-_last)*1000.0))
+    _last=now
+
+def elapsed_ms()->float:
+    return (time.perf_counter()-_t0)*1000.0
+
+def report(out=None):
+    out=out or sys.stderr
+    total=(_last-_t0)*1000.0
+    w=max((len(p) for p,_ in _phases),default=5)
+    for p,ms in _phases:
+        print(f"{p:<{w}}  {ms:8.1f} ms",file=out)
+    print(f"{'total':<{w}}  {total:8.1f} ms  (budget {BUDGET_MS:.0f} ms{', over' if total>BUDGET_MS else ''})",file=out)
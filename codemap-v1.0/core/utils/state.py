@@ -17,6 +17,7 @@ def load_state(file_path: str) -> Dict[str, Any]:
 def save_state(file_path: str, state: Dict[str, Any]) -> None:
     try:
         dir_path = os.path.dirname(os.path.abspath(file_path)) or "."
+        os.makedirs(dir_path, exist_ok=True)
         with tempfile.NamedTemporaryFile("w", delete=False, dir=dir_path, encoding="utf-8") as tmp:
             json.dump(state, tmp, indent=2)
             tmp_path = tmp.name
@@ -30,16 +31,18 @@ def _rel(path: str, base: str) -> str:
     except:
         return path
 
-def apply_state(node: TreeNode, state: Dict[str, Any], base_path: str, is_root: bool = False) -> None:
-    key = _rel(node.path, base_path)
-    if is_root:
-        node.expanded = True
-    node_state = state.get(key, {})
+def apply_node_state(node: TreeNode, state: Dict[str, Any], base_path: str) -> None:
+    node_state = state.get(_rel(node.path, base_path), {})
     if node.is_dir:
         node.expanded = node_state.get("expanded", node.expanded)
     else:
         node.disabled = node_state.get("disabled", node.disabled or False)
     node.update_render_name()
+
+def apply_state(node: TreeNode, state: Dict[str, Any], base_path: str, is_root: bool = False) -> None:
+    if is_root:
+        node.expanded = True
+    apply_node_state(node, state, base_path)
     for child in node.children:
         apply_state(child, state, base_path)
     if is_root:
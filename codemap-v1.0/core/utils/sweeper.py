@@ -3,16 +3,21 @@ import threading,time,gc
 from core.model.tree_node import TreeNode
 from core.utils.debug import log
 import core.utils.clipboard as clip
+from core.utils.scheduler import scheduler
+from core.operations.stripped import stripped_cache
+import core.operations.sniff as sniff
 
 def _loop(interval,token_mgr,file_filter):
     while True:
         try:
             token_mgr.trim_cache()
             clip.trim_caches()
+            stripped_cache.trim()
+            sniff.trim_cache()
             if file_filter:file_filter.clear_cache()
             TreeNode.clear_caches()
             gc.collect()
-            log("MAINTENANCE")
+            log("MAINTENANCE","token_cache",token_mgr.cache_stats(),"fragment_cache",clip.fragment_cache_stats(),"stripped_cache",stripped_cache.stats(),"scheduler",scheduler.stats())
         except:pass
         time.sleep(interval)
 
@@ -1,43 +1,113 @@
+import time;_T0=time.perf_counter()
 import argparse,os,sys,threading,curses
+import core.utils.startup as startup;startup.begin(_T0)
 from functools import partial
 import core.utils.debug
-from config import IGNORED_PATTERNS,ALLOWED_EXTENSIONS,STATE_FILE
-from core.filesystem import FileFilter,build_tree,watch_filesystem
-from core.operations import calculate_token_counts,token_count_manager
-from core.utils.state import load_state,apply_state
+from config import IGNORED_PATTERNS,ALLOWED_EXTENSIONS,STATE_FILE,TOKEN_CACHE_FILE
+from config.constants import start_refresh_probe
+from core.filesystem import FileFilter,ScanProgress,scan_tree,watch_filesystem
+from core.model import ChangeBus,TreeNode
+from core.operations import token_count_manager
+from core.operations.tokens import TOKEN_ENGINES
+from config.tokenizers import set_tokenizer,tokenizer_names
+from core.utils.state import load_state
 from core.utils.sweeper import start_maintenance
-from ui.application import run_application
+from core.utils.clipboard import start_clipboard_watch
 
 class CodeMap:
-    def __init__(self,root_path,copy_format,path_mode):
-        self.root_path=root_path;self.copy_format=copy_format;self.path_mode=path_mode
+    def __init__(self,root_path,copy_format,path_mode,chunk_tokens=0,strip=False):
+        self.root_path=root_path;self.copy_format=copy_format;self.path_mode=path_mode;self.chunk_tokens=chunk_tokens;self.strip=strip
         self.file_filter=FileFilter(IGNORED_PATTERNS,ALLOWED_EXTENSIONS)
         self.path_to_node={};self.lock=threading.Lock()
-        self.root_node=build_tree(self.root_path,self.file_filter,self.path_to_node,self.lock)
-        apply_state(self.root_node,load_state(STATE_FILE),base_path=self.root_node.path,is_root=True)
-        self.tree_changed_flag=threading.Event();self.stop_event=threading.Event()
+        self.root_node=TreeNode(self.root_path,True);self.root_node.expanded=True
+        self.path_to_node[self.root_path]=self.root_node
+        self.state=load_state(STATE_FILE)
+        startup.mark("load_state")
+        self.changes=ChangeBus();self.stop_event=threading.Event();self.scan=ScanProgress()
         self._start_background_threads()
+        startup.mark("background_threads")
 
     def _start_background_threads(self):
-        threading.Thread(target=calculate_token_counts,args=(self.root_node,self.path_to_node,self.tree_changed_flag,self.lock),daemon=True).start()
-        threading.Thread(target=watch_filesystem,args=(self.root_path,self.file_filter,self.path_to_node,self.tree_changed_flag,self.stop_event,self.lock),daemon=True).start()
+        start_refresh_probe()
+        start_clipboard_watch()
+        threading.Thread(target=self._scan,daemon=True,name="scan").start()
+        threading.Thread(target=watch_filesystem,args=(self.root_path,self.file_filter,self.path_to_node,self.changes,self.stop_event,self.lock),daemon=True).start()
         start_maintenance(token_count_manager,self.file_filter,120.0)
 
+    def _scan(self):
+        token_count_manager.load_cache(TOKEN_CACHE_FILE)
+        scan_tree(self.root_node,self.file_filter,self.path_to_node,self.lock,self.changes,self.state,self.scan)
+
     def run(self):
-        try:curses.wrapper(partial(run_application,root_node=self.root_node,path_to_node=self.path_to_node,fmt=self.copy_format,path_mode=self.path_mode,tree_changed_flag=self.tree_changed_flag,lock=self.lock))
-        finally:self.stop_event.set()
+        from ui.application import run_application
+        startup.mark("pre_curses")
+        try:curses.wrapper(partial(run_application,root_node=self.root_node,path_to_node=self.path_to_node,fmt=self.copy_format,path_mode=self.path_mode,changes=self.changes,lock=self.lock,scan=self.scan,chunk_tokens=self.chunk_tokens,strip=self.strip))
+        finally:
+            self.stop_event.set()
+            token_count_manager.save_cache(TOKEN_CACHE_FILE)
 
-def _parse_args():
-    p=argparse.ArgumentParser(description='CodeMap - A file tree explorer for code')
+def _add_common_args(p):
     p.add_argument('directory',nargs='?',default='.',help='Directory to scan for code files.')
     p.add_argument('--copy-format',choices=['blocks','lines','raw','optimized','compact','dash'],default='dash',help='Format used for copying file segments.')
     p.add_argument('--path-mode',choices=['relative','basename'],default='relative',help='Display mode for file paths.')
+    p.add_argument('--tokenizer',choices=tokenizer_names(),default=None,help='Tokenizer backend (default: $CM_TOKENIZER or auto).')
+    p.add_argument('--encoding',default=None,help='Encoding or model name for the tiktoken backend (default: $CM_ENCODING or gpt-4o).')
+    p.add_argument('--token-engine',choices=list(TOKEN_ENGINES),default=None,help='Token counting backend (default: $CM_TOKEN_ENGINE or auto).')
+    p.add_argument('--chunk-tokens',type=int,default=int(os.getenv('CM_CHUNK_TOKENS',0)),metavar='N',help='Split copies into bundles of at most N tokens (default: $CM_CHUNK_TOKENS or off).')
+    p.add_argument('--strip-comments',action='store_true',help='Copy files with comments, docstrings and blank runs removed; files on disk are not touched.')
+
+def _parse_args():
+    p=argparse.ArgumentParser(description='CodeMap - A file tree explorer for code',epilog="Run 'codemap export -h' for the headless export mode.")
+    _add_common_args(p)
+    p.add_argument('--startup-profile',action='store_true',help='Draw the first frame, exit, and report time spent per startup phase.')
     return p.parse_args()
 
+def _parse_export_args(argv):
+    p=argparse.ArgumentParser(prog='codemap export',description='Write the selected files of a directory as one formatted bundle, without the UI.')
+    _add_common_args(p)
+    p.add_argument('-o','--output',default='-',help="Output file ('-' for stdout).")
+    p.add_argument('--include',action='append',default=[],metavar='GLOB',help='Only export files whose relative path or name matches GLOB. Repeatable.')
+    p.add_argument('--exclude',action='append',default=[],metavar='GLOB',help='Skip files and directories whose relative path or name matches GLOB. Repeatable.')
+    p.add_argument('--no-state',action='store_true',help='Ignore the saved expand/disable state and export every file.')
+    p.add_argument('--no-tokens',action='store_true',help='Skip token counting.')
+    a=p.parse_args(argv)
+    if a.chunk_tokens>0 and (a.output=='-' or a.no_tokens):p.error('--chunk-tokens needs --output and token counting')
+    return a
+
+def _configure(a):
+    if not os.path.isdir(a.directory):
+        print(f"Error: '{a.directory}' is not a directory.",file=sys.stderr);sys.exit(1)
+    if a.token_engine:token_count_manager.set_engine(a.token_engine)
+    set_tokenizer(a.tokenizer,a.encoding)
+
+def export(argv=None):
+    from core.operations.export import export_bundle,export_chunks
+    a=_parse_export_args(sys.argv[2:] if argv is None else argv)
+    _configure(a)
+    state=None if a.no_state or a.include or a.exclude else load_state(STATE_FILE) or None
+    root=os.path.abspath(a.directory)
+    if not a.no_tokens:token_count_manager.load_cache(TOKEN_CACHE_FILE)
+    if a.chunk_tokens>0:res=export_chunks(root,a.output,a.copy_format,a.chunk_tokens,a.path_mode,state,a.include,a.exclude,strip=a.strip_comments)
+    else:
+        if a.output=='-':
+            out=sys.stdout
+            if hasattr(out,'reconfigure'):out.reconfigure(encoding='utf-8',errors='replace')
+        else:out=open(a.output,'w',encoding='utf-8',newline='')
+        try:res=export_bundle(root,out,a.copy_format,a.path_mode,state,a.include,a.exclude,tokens=not a.no_tokens,strip=a.strip_comments)
+        finally:
+            if out is not sys.stdout:out.close()
+    if not a.no_tokens:token_count_manager.save_cache(TOKEN_CACHE_FILE)
+    token_count_manager.stop()
+    print(res.summary(),file=sys.stderr)
+
 def run():
+    startup.mark("imports")
+    if len(sys.argv)>1 and sys.argv[1]=='export':return export()
     a=_parse_args()
-    if not os.path.isdir(a.directory):
-        print(f"Error: '{a.directory}' is not a directory.");sys.exit(1)
-    CodeMap(os.path.abspath(a.directory),a.copy_format,a.path_mode).run()
+    startup.enable(a.startup_profile)
+    _configure(a)
+    startup.mark("args")
+    CodeMap(os.path.abspath(a.directory),a.copy_format,a.path_mode,a.chunk_tokens,a.strip_comments).run()
+    if startup.enabled:startup.report()
 
 if __name__=='__main__':run()
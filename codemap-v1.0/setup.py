@@ -24,6 +24,7 @@ setup(
     entry_points={
         'console_scripts': [
             'codemap=main:run',
+            'codemap-export=main:export',
         ],
     },
     python_requires='>=3.6',
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+pytest.importorskip("tiktoken")
+
+from config.tokenizers import set_tokenizer, tokenizer_spec
+from core.operations.tokens import _SAMPLE_BYTES, _SAMPLE_WINDOWS, count_tokens_streaming, estimate_tokens_sampled
+
+_WORDS = [
+    "def", "return", "self", "value", "index", "count", "path", "None", "if", "for", "in", "import",
+    "class", "result", "=", "+", "(", ")", ":", ",", "[]", "{}", "0", "1", "42", "'text'", "# note",
+
+]
+
+_FILES = 20
+
+_FILE_BYTES = 1 << 20
+
+def _source(rng: random.Random, size: int) -> str:
+    lines = []
+    n = 0
+    while n < size:
+        line = "    " * rng.randrange(4) + " ".join(rng.choice(_WORDS) for _ in range(rng.randrange(2, 12)))
+        lines.append(line)
+        n += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+@pytest.fixture(scope="module", autouse=True)
+def exact_tokenizer():
+    spec = tokenizer_spec()
+    try:
+        set_tokenizer("tiktoken").warm()
+    except Exception as e:
+        set_tokenizer(*spec)
+        pytest.skip(f"tiktoken encoding unavailable: {e}")
+    yield
+    set_tokenizer(*spec)
+
+def test_files_within_sample_span_are_exact(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("small.py", "w") as f:
+        f.write(_source(random.Random(0), _SAMPLE_WINDOWS * _SAMPLE_BYTES // 2))
+    count, bound, full = estimate_tokens_sampled("small.py")
+    assert full
+    assert bound == 0
+    assert count == count_tokens_streaming("small.py")
+
+def test_sampled_estimates_fall_within_bound(tmp_path, monkeypatch):
+    # Windows are seeded by path, so relative names keep the samples fixed across runs.
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(29)
+    covered = 0
+    for i in range(_FILES):
+        path = f"big{i}.py"
+        with open(path, "w") as f:
+            f.write(_source(rng, _FILE_BYTES))
+        count, bound, full = estimate_tokens_sampled(path)
+        exact = count_tokens_streaming(path)
+        assert not full
+        assert 0 < bound < exact * 0.01
+        assert abs(count - exact) <= exact * 0.01
+        covered += abs(count - exact) <= bound
+    assert covered >= _FILES * 0.8
@@ -1,14 +1,34 @@
-import curses, time, threading, gc, signal
-from typing import Dict, List, Tuple, Optional
+import curses, time, threading, gc, signal, os
+from typing import Dict, List, Tuple, Set
 import config.constants as cfg
-from core.model import TreeNode
-from core.operations import flatten_tree
+from core.model import TreeNode, ChangeBus, ChangeType
+from core.operations import flatten_tree, token_updates
+from core.operations.tree_ops import flatten_subtree
+from core.operations.bundle import template_overhead
+from core.operations.stripped import stripped_cache
+from core.utils.jobs import job_manager
+from core.utils.clipboard import clipboard_version, paste_index, poke_clipboard, set_paste_root
 from ui.rendering import init_colors, Renderer
 from ui.core.state import State
 from ui.controls.manager import ControlManager
 from ui.controls.keyboard import KeyboardEventHandler
 from ui.controls.actions import ActionHandler
 from core.utils.terminal import reset_terminal
+import core.utils.startup as startup
+
+_MAX_FRAME_INTERVAL = 0.1
+
+_MAX_SPLICES = 32
+
+_OVERHEAD_INTERVAL = 0.25
+
+def _has_ancestor(n: TreeNode, nodes) -> bool:
+    p = n.parent
+    while p is not None:
+        if p in nodes:
+            return True
+        p = p.parent
+    return False
 
 class Application:
     def __init__(
@@ -18,20 +38,30 @@ class Application:
         path_to_node: Dict[str, TreeNode],
         fmt: str,
         path_mode: str,
-        tree_changed_flag: threading.Event,
+        changes: ChangeBus,
         lock: threading.Lock,
+        scan=None,
+        chunk_tokens: int = 0,
+        strip: bool = False,
     ):
         self.s = stdscr
+        self.scan = scan
+        self.chunk_tokens = chunk_tokens
+        self.strip = strip
         self.rn = root_node
         self.p2n = path_to_node
         self.fmt = fmt
         self.pm = path_mode
-        self.tc_flag = tree_changed_flag
+        self.changes = changes
         self.l = lock
         self.resized = False
-        self.fi = cfg.get_cli_refresh_interval()
+        self.base_fi = self.fi = cfg.get_cli_refresh_interval(wait=False)
         self._init()
+        startup.mark("ui_init")
         self._render()
+        startup.mark("first_frame")
+        self.kb.setup(callback_fn=self._render)
+        startup.mark("keyboard_hook")
 
     def _init(self):
         curses.curs_set(0)
@@ -52,7 +82,13 @@ class Application:
         self.u = State()
         self.cache: List[Tuple[TreeNode, str, bool]] = []
         self.tot = 0
-        self.sel: Optional[str] = None
+        self.ovh: Dict[TreeNode, int] = {}
+        self.stp: Dict[TreeNode, int] = {}
+        self._ovh_dirty = True
+        self._ovh_gen = (-1, -1)
+        self._ovh_t = 0.0
+        self._clip_v = -1
+        set_paste_root(self.rn.path)
         self.action_changed = False
         self.renderer = Renderer(self.s, self.u)
         self.cm = ControlManager(self.u)
@@ -64,19 +100,62 @@ class Application:
             self.p2n,
             self.fmt,
             self.pm,
-            self.tc_flag,
+            self.changes,
             self.l,
+            self.scan,
+            self.chunk_tokens,
+            self.strip,
         )
         self.ah.register_handlers(self.cm)
-        self.kb.setup(callback_fn=self._render)
         self._rebuild()
 
     def _rebuild(self):
         with self.l:
-            self.tot = self.rn.calculate_token_count()
+            self.rn.calculate_token_count()
             self.cache = list(flatten_tree(self.rn, is_root=True))
-            if self.cache and 0 <= self.u.current_index < len(self.cache):
-                self.sel = self.cache[self.u.current_index][0].path
+            self._overhead()
+            self.tot = self._total()
+
+    def _total(self) -> int:
+        if self.strip:
+            return self.stp.get(self.rn, 0)
+        return self.rn.token_count + self.ovh.get(self.rn, 0)
+
+    def _generation(self) -> Tuple[int, int]:
+        return template_overhead.generation, stripped_cache.generation if self.strip else 0
+
+    def _overhead(self):
+        files = [n for n, _, _ in self.cache if not n.is_dir]
+        cut = len(self.rn.path) + 1
+        ovh: Dict[TreeNode, int] = {}
+        stp: Dict[TreeNode, int] = {}
+        missing = []
+        for n, extra in zip(files, template_overhead.for_paths(self.fmt, [n.path[cut:] for n in files])):
+            ovh[n] = extra
+            s = 0
+            if self.strip:
+                cnt = stripped_cache.count(n.path, n.stat_key)
+                if cnt is None:
+                    cnt = n.token_count
+                    if n.stat_key is not None:
+                        missing.append((n.path, n.stat_key))
+                s = stp[n] = cnt + extra
+            if n.disabled:
+                continue
+            p = n.parent
+            while p is not None:
+                ovh[p] = ovh.get(p, 0) + extra
+                if self.strip:
+                    stp[p] = stp.get(p, 0) + s
+                p = p.parent
+        if missing:
+            stripped_cache.queue(missing, self.ah._file_content)
+        self.ovh = self.renderer.overhead = ovh
+        self.stp = self.renderer.stripped = stp
+        self._ovh_gen = self._generation()
+        self._ovh_dirty = False
+        self._ovh_t = time.perf_counter()
+        self.renderer.invalidate()
 
     def run(self):
         try:
@@ -93,15 +172,18 @@ class Application:
                 redraw = self._events()
                 handled = self._input()
                 if handled:
-                    if self.tc_flag.is_set():
-                        self._tree_change()
+                    poke_clipboard()
+                    if self.changes:
+                        self._apply_changes()
                     redraw = True
                 if redraw:
                     self._render()
+                    self._pace()
                     nxt = time.perf_counter()
                 if now - gc_t > 5.0:
                     gc.collect()
                     gc_t = now
+                    self.base_fi = cfg.get_cli_refresh_interval(wait=False)
                 slp = nxt + self.fi - time.perf_counter()
                 if slp > 0:
                     time.sleep(min(slp, 0.002))
@@ -111,18 +193,48 @@ class Application:
             self.kb.cleanup()
             reset_terminal(self.s)
 
+    def _pace(self):
+        self.fi = max(self.base_fi, min(_MAX_FRAME_INTERVAL, self.renderer.write_latency * 2))
+
+    def _apply_tokens(self) -> bool:
+        with self.l:
+            if not token_updates.apply(self.p2n):
+                return False
+            self._ovh_dirty = self._ovh_dirty or self.strip
+            self.tot = self._total()
+            self._root_row()
+        self.renderer.invalidate()
+        return True
+
+    def _root_row(self):
+        if self.cache and self.cache[0][0] is self.rn and self.cache[0][2] != (self.tot > 0):
+            self.cache = [(self.rn, self.cache[0][1], self.tot > 0)] + self.cache[1:]
+
     def _events(self) -> bool:
         r = False
-        if self.tc_flag.is_set():
-            self._tree_change()
+        if token_updates and self._apply_tokens():
+            r = True
+        if self._poll_jobs():
+            r = True
+        if self.changes and self._apply_changes():
             r = True
         if self.u.redraw_needed.is_set():
             self.u.redraw_needed.clear()
             r = True
         if self.u.clear_success_if_expired(0.5):
             r = True
+        if self._ovh_stale():
+            r = True
+        if self._clip_v != clipboard_version():
+            self._clip_v = clipboard_version()
+            self.renderer.paste = paste_index()
+            self.renderer.invalidate()
+            r = True
         return r
 
+    def _ovh_stale(self) -> bool:
+        return (self._ovh_dirty or self._ovh_gen != self._generation()) and time.perf_counter() - self._ovh_t >= _OVERHEAD_INTERVAL
+
     def _input(self) -> bool:
         k = self.s.getch()
         if k == curses.KEY_RESIZE:
@@ -130,26 +242,76 @@ class Application:
             return False
         return self.kb.handle_key(k)
 
-    def _tree_change(self):
-        self._rebuild()
+    def _poll_jobs(self) -> bool:
+        r = False
+        for job in job_manager.reap():
+            if job.on_done:
+                job.on_done(job)
+            r = True
+        st = job_manager.status()
+        if st != self.u.job_status:
+            self.u.job_status = st
+            r = True
+        ss = self.scan.status() if self.scan else ""
+        if ss != self.u.scan_status:
+            self.u.scan_status = ss
+            r = True
+        return r
+
+    def _apply_changes(self) -> bool:
+        ch = self.changes.drain()
+        if not ch:
+            return False
+        dirty: Set[str] = set(ch.get(ChangeType.EXPANSION, ()))
+        for kind in (ChangeType.NODE_ADDED, ChangeType.NODE_REMOVED):
+            dirty.update(os.path.dirname(p) for p in ch.get(kind, ()))
         with self.l:
-            if self.sel:
-                for i, (n, _, _) in enumerate(self.cache):
-                    if n.path == self.sel:
-                        self.u.current_index = i
-                        break
-            else:
-                self.u.update_selected_index(0, len(self.cache))
-            self.tc_flag.clear()
+            if dirty:
+                self._restructure(dirty)
+            self._ovh_dirty = True
+            self.tot = self._total()
+            self._root_row()
+        self.renderer.invalidate()
         self.action_changed = False
-        self.sel = None
+        return True
+
+    def _restructure(self, dirty: Set[str]):
+        sel = self.cache[self.u.current_index][0] if 0 <= self.u.current_index < len(self.cache) else None
+        nodes = {n for n in (self.p2n.get(p) for p in dirty) if n is not None and n.is_dir}
+        tops = [n for n in nodes if not _has_ancestor(n, nodes)]
+        if len(tops) > _MAX_SPLICES:
+            self.cache = list(flatten_tree(self.rn, is_root=True))
+        else:
+            for n in tops:
+                self._splice(n)
+        pos = {row[0].path: i for i, row in enumerate(self.cache)}
+        while sel is not None and sel.path not in pos:
+            sel = sel.parent
+        if sel is not None:
+            self.u.current_index = pos[sel.path]
+        else:
+            self.u.update_selected_index(0, len(self.cache))
+
+    def _splice(self, node: TreeNode):
+        cache = self.cache
+        i = next((i for i, row in enumerate(cache) if row[0] is node), -1)
+        if i < 0:
+            return
+        j = i + 1
+        while j < len(cache) and _has_ancestor(cache[j][0], (node,)):
+            j += 1
+        self.cache = cache[:i] + flatten_subtree(node) + cache[j:]
 
     def _render(self):
         rows = self.s.getmaxyx()[0] - 1
         with self.l:
             if self.action_changed:
-                self.tot = self.rn.calculate_token_count()
+                self.rn.calculate_token_count()
                 self.action_changed = False
+                self._ovh_dirty = True
+            if self._ovh_stale():
+                self._overhead()
+            self.tot = self._total()
             self.u.ensure_visible(rows, len(self.cache))
             cur = None
             if self.cache and 0 <= self.u.current_index < len(self.cache):
@@ -163,18 +325,27 @@ def run_application(
     path_to_node: Dict[str, TreeNode],
     fmt: str,
     path_mode: str,
-    tree_changed_flag: threading.Event,
+    changes: ChangeBus,
     lock: threading.Lock,
+    scan=None,
+    chunk_tokens: int = 0,
+    strip: bool = False,
 
 ):
     if hasattr(curses, "update_lines_cols"):
         curses.update_lines_cols()
-    Application(
+    app = Application(
         stdscr,
         root_node,
         path_to_node,
         fmt,
         path_mode,
-        tree_changed_flag,
+        changes,
         lock,
-    ).run()
+        scan,
+        chunk_tokens,
+        strip,
+    )
+    if startup.enabled:
+        app.u.should_quit = True
+    app.run()
@@ -1,21 +1,24 @@
 import os
 import threading
 import curses
-from typing import Optional, Dict, List, Tuple, Set
+from typing import Optional, Dict, List, Tuple
 
-from core.model import TreeNode
-from core.operations import toggle_node, toggle_subtree
+from core.model import TreeNode, ChangeBus, ChangeType
+from core.operations import toggle_node, toggle_subtree, pack_chunks, read_file_content
+from core.operations.bundle import template_overhead
+from core.operations.stripped import stripped_cache
 from core.operations.tree_ops import are_all_files_enabled, toggle_folder_enable_state
-from core.utils.clipboard import copy_files_subloop, copy_text_to_clipboard, has_valid_paste, paste_into
+from core.utils.clipboard import copy_files_stream, has_valid_paste, paste_into
 from core.refactor.ops import refactor_file
 from core.refactor.bulk import refactor_files
-from core.utils.state import gather_state, save_state
+from core.utils.state import gather_state, load_state, save_state
 from core.utils.snapshot import save_snapshot, load_snapshot, delete_snapshot, has_snapshot
+from core.utils.jobs import Job, job_manager
 from core.utils.terminal import reset_terminal
 from core.utils.debug import log
 from config import STATE_FILE
 from config.ui_labels import (
-    REFACTOR_SUCCESS_MESSAGE, REFACTOR_ALL_SUCCESS_MESSAGE, SUCCESS_MESSAGE
+    REFACTOR_SUCCESS_MESSAGE, REFACTOR_ALL_SUCCESS_MESSAGE, SUCCESS_MESSAGE, CHUNK_SUCCESS_MESSAGE
 
 )
 from ui.controls.events import EventType
@@ -31,8 +34,11 @@ class ActionHandler:
         path_to_node: Dict[str, TreeNode],
         fmt: str,
         path_mode: str,
-        tree_changed_flag: threading.Event,
-        lock: threading.Lock
+        changes: ChangeBus,
+        lock: threading.Lock,
+        scan=None,
+        chunk_tokens: int = 0,
+        strip: bool = False
     ):
         self.stdscr = stdscr
         self.ui_state = ui_state
@@ -40,8 +46,12 @@ class ActionHandler:
         self.path_to_node = path_to_node
         self.fmt = fmt
         self.path_mode = path_mode
-        self.tree_changed_flag = tree_changed_flag
+        self.changes = changes
         self.lock = lock
+        self.scan = scan
+        self.chunk_tokens = chunk_tokens
+        self.strip = strip
+        self._chunk_cursor: Tuple[Tuple[str, ...], int] = ((), -1)
         self.current_node: Optional[TreeNode] = None
         self.flattened_cache: List[Tuple[TreeNode, int, bool]] = []
         self.selected_node_path: Optional[str] = None
@@ -64,10 +74,7 @@ class ActionHandler:
                 out.append(nd)
         walk(folder); return out
 
-    def _file_content(self, p: str) -> str:
-        try:
-            with open(p, "rb") as f: return f.read().decode("latin-1")
-        except: return "<Could not read file>"
+    _file_content = staticmethod(read_file_content)
     canon = staticmethod(lambda p: os.path.normcase(os.path.abspath(p)))
     def _rel(self, p: str) -> str: return os.path.relpath(p, self.root_node.path)
 
@@ -86,7 +93,7 @@ class ActionHandler:
         with self.lock:
             toggle_node(self.current_node)
             self.root_node.calculate_token_count()
-            self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.EXPANSION, self.current_node.path)
         return True
 
     def handle_toggle_subtree(self, e):
@@ -94,7 +101,7 @@ class ActionHandler:
         with self.lock:
             toggle_subtree(self.current_node)
             self.root_node.calculate_token_count()
-            self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.EXPANSION, self.current_node.path)
         return True
 
     def handle_toggle_disable(self, e):
@@ -103,39 +110,73 @@ class ActionHandler:
             self.current_node.disabled = not self.current_node.disabled
             self.current_node.update_render_name()
             self.root_node.calculate_token_count()
-            self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.STATE, self.current_node.path)
             log("DISABLE" if self.current_node.disabled else "ENABLE", self._rel(self.current_node.path))
         return True
 
+    def _on_done(self, message: str, path: Optional[str] = None, tag: Optional[str] = None):
+        def done(job: Job):
+            if job.cancelled:
+                self.ui_state.set_success(f"{job.name} cancelled")
+            elif job.ok:
+                if tag: log(tag, self._rel(path))
+                self.ui_state.set_success(message)
+            if path: self.changes.publish(ChangeType.STATE, path)
+        return done
+
+    def _copy_job(self, job: Job, paths: List[str], tokens: int) -> bool:
+        root_path = self.root_node.path
+        files = [(os.path.relpath(p, root_path), p) for p in paths]
+        if self.strip:
+            read = lambda p: stripped_cache.text(p, self._file_content)
+            copy_files_stream(files, self.fmt, read, tokens, job.token, job.advance, tag="\0strip")
+        else:
+            copy_files_stream(files, self.fmt, self._file_content, tokens, job.token, job.advance)
+        return True
+
+    def _content_tokens(self, n: TreeNode) -> int:
+        if self.strip:
+            cnt = stripped_cache.count(n.path, n.stat_key)
+            if cnt is not None:
+                return cnt
+        return n.token_count
+
     def handle_copy_content(self, e):
         if not self.current_node: return False
-        root_path = self.root_node.path; files = []
-        if self.current_node.is_dir:
-            for nd in self._visible_enabled_descendants(self.current_node):
-                files.append((os.path.relpath(nd.path, root_path), self._file_content(nd.path)))
-        else:
-            files.append((os.path.relpath(self.current_node.path, root_path), self._file_content(self.current_node.path)))
-        if not files: return False
-        copy_text = copy_files_subloop(self.stdscr, files, self.fmt)
-        copy_text_to_clipboard(copy_text)
-        self.ui_state.set_success(SUCCESS_MESSAGE)
+        nodes = self._visible_enabled_descendants(self.current_node) if self.current_node.is_dir else [self.current_node]
+        if not nodes: return False
+        paths = [n.path for n in nodes]
+        extra = template_overhead.for_paths(self.fmt, [self._rel(p) for p in paths])
+        sizes = {n.path: self._content_tokens(n) + e for n, e in zip(nodes, extra)}
+        tokens = sum(sizes.values())
+        message, cursor = SUCCESS_MESSAGE, None
+        if self.chunk_tokens and tokens > self.chunk_tokens:
+            chunks = pack_chunks([(p, sizes[p]) for p in paths], self.chunk_tokens)
+            sel = tuple(paths)
+            i = (self._chunk_cursor[1] + 1) % len(chunks) if self._chunk_cursor[0] == sel else 0
+            cursor = (sel, i)
+            paths = chunks[i]
+            tokens = sum(sizes[p] for p in paths)
+            message = CHUNK_SUCCESS_MESSAGE.format(part=i + 1, parts=len(chunks))
+        if job_manager.submit("Copy", self._copy_job, paths, tokens, key=("copy",), total=len(paths),
+                              on_done=self._on_done(message)) is None:
+            return False
+        self._chunk_cursor = cursor or ((), -1)
         return True
 
-    def _allowed_targets(self) -> Set[str]:
-        if self.current_node.is_dir:
-            return {self.canon(n.path) for n in self._visible_enabled_descendants(self.current_node)}
-        return {self.canon(self.current_node.path)}
+    def _allowed_targets(self) -> Dict[str, Optional[Tuple[int, int, int]]]:
+        nodes = self._visible_enabled_descendants(self.current_node) if self.current_node.is_dir else [self.current_node]
+        return {self.canon(n.path): n.stat_key for n in nodes}
 
     def handle_paste_content(self, e):
         if not self.current_node: return False
         if not has_valid_paste(self.current_node.path, self.current_node.is_dir): return False
         allowed = self._allowed_targets()
         if not allowed: return False
-        if paste_into(self.current_node.path, self.current_node.is_dir, allowed):
-            self.tree_changed_flag.set()
-            self.ui_state.set_success("Pasted from Clipboard")
-            return True
-        return False
+        n = self.current_node
+        run = lambda job: paste_into(n.path, n.is_dir, allowed, job.token, job.advance)
+        return job_manager.submit("Paste", run, key=("paste",), total=len(allowed) if n.is_dir else 0,
+                                  on_done=self._on_done("Pasted from Clipboard", n.path)) is not None
 
     def handle_refactor_content(self, e):
         if not self.current_node: return False
@@ -143,10 +184,10 @@ class ActionHandler:
             if not (e.data and e.data.get("shift", False) and self.current_node.expanded): return False
             paths = [n.path for n in self._visible_enabled_descendants(self.current_node)]
             if not paths: return False
-            refactor_files(paths)
             log("REFACTOR_ALL", len(paths), "file(s)", self._rel(self.current_node.path))
-            self.ui_state.set_success(REFACTOR_ALL_SUCCESS_MESSAGE)
-            return True
+            run = lambda job: refactor_files(paths, job.token, job.advance)
+            return job_manager.submit("Refactor", run, key=("refactor", self.current_node.path), total=len(paths),
+                                      on_done=self._on_done(REFACTOR_ALL_SUCCESS_MESSAGE, self.current_node.path), io=True) is not None
         if refactor_file(self.current_node.path):
             log("REFACTOR", self._rel(self.current_node.path))
             self.ui_state.set_success(REFACTOR_SUCCESS_MESSAGE)
@@ -155,11 +196,9 @@ class ActionHandler:
 
     def handle_save_content(self, _):
         if not self.current_node or has_snapshot(self.current_node.path): return False
-        if save_snapshot(self.current_node.path):
-            log("SNAPSHOT_SAVE", self._rel(self.current_node.path))
-            self.ui_state.set_success("Snapshot saved")
-            return True
-        return False
+        p = self.current_node.path
+        return job_manager.submit("Snapshot", lambda job: save_snapshot(p, job.advance), key=("snapshot", p),
+                                  on_done=self._on_done("Snapshot saved", p, "SNAPSHOT_SAVE"), io=True) is not None
 
     def handle_load_content(self, _):
         if not self.current_node or not has_snapshot(self.current_node.path): return False
@@ -169,12 +208,9 @@ class ActionHandler:
                 self.ui_state.set_success("Snapshot deleted")
                 return True
             return False
-        if load_snapshot(self.current_node.path):
-            log("SNAPSHOT_LOAD", self._rel(self.current_node.path))
-            self.ui_state.set_success("Snapshot loaded")
-            self.tree_changed_flag.set()
-            return True
-        return False
+        p = self.current_node.path
+        return job_manager.submit("Restore", lambda job: load_snapshot(p, job.advance), key=("snapshot", p),
+                                  on_done=self._on_done("Snapshot loaded", p, "SNAPSHOT_LOAD"), io=True) is not None
 
     def _prompt_search(self) -> str:
         prompt = "Search: "
@@ -203,9 +239,14 @@ class ActionHandler:
         return False
     def handle_enter_key(self, e): return self.handle_toggle_node(e)
 
+    def handle_cancel_jobs(self, _):
+        return job_manager.cancel()
+
     def handle_quit(self, _):
+        job_manager.cancel()
         with self.lock:
-            state = {}; gather_state(self.root_node, state, self.root_node.path, True); save_state(STATE_FILE, state)
+            state = load_state(STATE_FILE) if self.scan is not None and not self.scan.done else {}
+            gather_state(self.root_node, state, self.root_node.path, True); save_state(STATE_FILE, state)
         reset_terminal(self.stdscr); self.ui_state.should_quit = True; return True
     def handle_shift_mode_changed(self, _): return True
 
@@ -215,7 +256,7 @@ class ActionHandler:
             new_state = not are_all_files_enabled(self.current_node)
             toggle_folder_enable_state(self.current_node, new_state)
             self.root_node.calculate_token_count()
-            self.tree_changed_flag.set()
+            self.changes.publish(ChangeType.STATE, self.current_node.path)
             log("ENABLE_ALL" if new_state else "DISABLE_ALL", self._rel(self.current_node.path))
         return True
 
@@ -235,3 +276,4 @@ class ActionHandler:
         cm.register_handler(EventType.SHIFT_MODE_CHANGED, self.handle_shift_mode_changed)
         cm.register_handler(EventType.SHIFT_DISABLE_ALL,  self.handle_shift_disable_all)
         cm.register_handler(EventType.SEARCH,             self.handle_search)
+        cm.register_handler(EventType.CANCEL_JOBS,        self.handle_cancel_jobs)
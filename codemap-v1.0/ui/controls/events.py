@@ -16,6 +16,7 @@ class EventType(Enum):
     SHIFT_MODE_CHANGED = auto()
     SHIFT_DISABLE_ALL  = auto()
     SEARCH             = auto()
+    CANCEL_JOBS        = auto()
 
 class Event:
     def __init__(self, event_type: EventType, source: str = None, data: dict | None = None):
@@ -1,4 +1,4 @@
-import keyboard,curses
+import curses
 from ui.controls.manager import ControlManager
 from ui.controls.events import Event,EventType
 from ui.core.state import State
@@ -9,12 +9,15 @@ class KeyboardEventHandler:
         self.ui_state=ui_state
         self._keyboard_hooked=False
         self._callback_fn=None
+        self._kb=None
 
     def setup(self,callback_fn=None):
         if self._keyboard_hooked:
             return True
         try:
             self._callback_fn=callback_fn
+            import keyboard
+            self._kb=keyboard
             keyboard.hook(self._key_handler)
             self._keyboard_hooked=True
             return True
@@ -23,7 +26,7 @@ class KeyboardEventHandler:
 
     def cleanup(self):
         if self._keyboard_hooked:
-            keyboard.unhook_all()
+            self._kb.unhook_all()
             self._keyboard_hooked=False
 
     def handle_key(self,key:int):
@@ -34,9 +37,9 @@ class KeyboardEventHandler:
             return self.control_manager.handle_event(evt)
         return False
 
-    def _key_handler(self,event:keyboard.KeyboardEvent):
+    def _key_handler(self,event):
         name=event.name
-        ev_down=event.event_type==keyboard.KEY_DOWN
+        ev_down=event.event_type==self._kb.KEY_DOWN
         if name in ("shift","left shift","right shift"):
             if self.ui_state.physical_shift_pressed!=ev_down:
                 self.ui_state.set_shift(ev_down)
@@ -1,6 +1,6 @@
 import time, curses
 from typing import Dict, Callable, Optional
-from config import CLI_REFRESH_INTERVAL
+from config.constants import get_cli_refresh_interval
 from ui.controls.events import Event, EventType
 from ui.core.state import State
 
@@ -8,7 +8,7 @@ class ControlManager:
     def __init__(self, ui_state: State):
         self.ui_state = ui_state
         self.event_handlers: Dict[EventType, Callable[[Event], bool]] = {}
-        base = CLI_REFRESH_INTERVAL
+        base = get_cli_refresh_interval(wait=False)
         self.throttle: Dict[EventType, float] = {
             EventType.COPY_CONTENT:     base * 4,
             EventType.PASTE_CONTENT:    base * 4,
@@ -43,6 +43,9 @@ class ControlManager:
         add(ord("r"), Event(EventType.REFACTOR_CONTENT,"keyboard"))
         add(ord("R"), Event(EventType.REFACTOR_CONTENT,"keyboard"))
         add(ord('/'), Event(EventType.SEARCH,        "keyboard"))
+        add(ord("x"), Event(EventType.CANCEL_JOBS,   "keyboard"))
+        add(ord("X"), Event(EventType.CANCEL_JOBS,   "keyboard"))
+        add(27,       Event(EventType.CANCEL_JOBS,   "keyboard"))
         add(curses.KEY_ENTER, Event(EventType.ENTER_KEY, "keyboard"))
         add(10, Event(EventType.ENTER_KEY, "keyboard"))
         add(13, Event(EventType.ENTER_KEY, "keyboard"))
@@ -95,7 +95,11 @@ def render_single_label(stdscr, y: int, x: int, label_key: str,
 
 def token_value_getter(context: Dict[str, Any]) -> str:
     if "node" in context and hasattr(context["node"], "token_count"):
-        return context["node"].token_count
+        node = context["node"]
+        count = node.token_count + context.get("overhead", 0)
+        bound = getattr(node, "token_bound", 0)
+        count = f"~{count}±{bound}" if bound else f"~{count}" if getattr(node, "token_approx", False) else count
+        return f"{count} → {context['stripped']}" if "stripped" in context else count
     if "node_tokens" in context:
         return context["node_tokens"]
     if "total_tokens" in context and context["total_tokens"] > 0:
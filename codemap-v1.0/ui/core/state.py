@@ -13,6 +13,8 @@ class State:
         self.success_message_time=0.0
         self.success_message=SUCCESS_MESSAGE
         self.should_quit=False
+        self.job_status=""
+        self.scan_status=""
         self.redraw_needed=threading.Event()
         self.step_normal=SCROLL_SPEED["normal"]
         self.step_accel=SCROLL_SPEED["accelerated"]
@@ -22,6 +22,8 @@ SELECTED_DIRECTORY_COLOR=11
 
 SELECTED_DISABLED_COLOR=12
 
+PASTE_TARGET_COLOR=13
+
 def init_colors():
     curses.start_color()
     curses.use_default_colors()
@@ -36,3 +38,4 @@ def init_colors():
     curses.init_pair(SELECTED_FILE_COLOR,curses.COLOR_WHITE,-1)
     curses.init_pair(SELECTED_DIRECTORY_COLOR,curses.COLOR_GREEN,-1)
     curses.init_pair(SELECTED_DISABLED_COLOR,curses.COLOR_RED,-1)
+    curses.init_pair(PASTE_TARGET_COLOR,curses.COLOR_CYAN,-1)
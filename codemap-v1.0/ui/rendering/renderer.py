@@ -1,13 +1,14 @@
 import curses, time
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from core.model import TreeNode
 from config.constants import SUCCESS_MESSAGE_DURATION
 from ui.rendering.components import render_status_bar, render_success_message
 from ui.core.state import State
 from ui.rendering.text import safe_addnstr, clear_line
-from ui.rendering.colors import FILE_COLOR, DIRECTORY_COLOR, DISABLED_COLOR, GENERAL_UI_COLOR
+from ui.rendering.colors import FILE_COLOR, DIRECTORY_COLOR, DISABLED_COLOR, GENERAL_UI_COLOR, PASTE_TARGET_COLOR
 from ui.core.labels import render_single_label
 from config.ui_labels import SEPARATOR
+from core.operations.sniff import KIND_TAGS
 from config.symbols import CURSOR_SYMBOL_SELECTED, CURSOR_SYMBOL_UNSELECTED, ARROW_COLLAPSED, ARROW_EXPANDED
 
 class Renderer:
@@ -19,6 +20,20 @@ class Renderer:
         self.pt = self.ps = False
         self.pd = self.pf = False
         self.pl: List[Tuple[TreeNode, str, bool]] = []
+        self.write_latency = 0.0
+        self.overhead: Dict[TreeNode, int] = {}
+        self.stripped: Dict[TreeNode, int] = {}
+        self.paste = None
+
+    def invalidate(self):
+        self.pl = None
+
+    def _flush(self):
+        t = time.perf_counter()
+        self.s.noutrefresh()
+        curses.doupdate()
+        dt = time.perf_counter() - t
+        self.write_latency = dt if not self.write_latency else self.write_latency * 0.9 + dt * 0.1
 
     def _trunc(self, t: str, w: int) -> str:
         return t if w <= 3 or len(t) <= w else t[: w - 3] + "..."
@@ -43,6 +58,8 @@ class Renderer:
     def _base_color(self, n: TreeNode):
         if n.disabled:
             return DISABLED_COLOR
+        if self.paste is not None and self.paste.receives(n.path, n.is_dir):
+            return PASTE_TARGET_COLOR
         return DIRECTORY_COLOR if n.is_dir else FILE_COLOR
 
     def _line(self, n: TreeNode, prefix: str, row: int, sel: bool, show_tokens: bool):
@@ -63,8 +80,15 @@ class Renderer:
         name = self._trunc(n.render_name, mx - x - 15)
         safe_addnstr(self.s, row, x, name, clr, attr)
         x += len(name)
+        tag = KIND_TAGS.get(n.kind) if not n.is_dir else None
+        if tag and x + 15 < mx:
+            tag = f" [{tag}]"
+            safe_addnstr(self.s, row, x, tag, DISABLED_COLOR)
+            x += len(tag)
         if show_tokens and n.token_count > 0 and x + 15 < mx:
-            ctx = {"node": n}
+            ctx = {"node": n, "overhead": self.overhead.get(n, 0)}
+            if n in self.stripped:
+                ctx["stripped"] = self.stripped[n]
             x = render_single_label(
                 self.s, row, x, "tokens", ctx,
                 separator=SEPARATOR, separator_color=GENERAL_UI_COLOR, show_separator=True
@@ -86,7 +110,7 @@ class Renderer:
         else:
             render_status_bar(
                 self.s, c, self.u.physical_shift_pressed,
-                self.u.physical_delete_pressed, tot, tv
+                self.u.physical_delete_pressed, tot, tv, self.u.job_status, self.u.scan_status
             )
 
     def render(self, l: List[Tuple[TreeNode, str, bool]], c: Optional[TreeNode], tot: int):
@@ -102,8 +126,7 @@ class Renderer:
         )
         if unchanged:
             self._footer(c, tot, tv, succ)
-            self.s.noutrefresh()
-            curses.doupdate()
+            self._flush()
             return
         quick = (
             l is self.pl and tv == self.pt and succ == self.ps and
@@ -122,8 +145,7 @@ class Renderer:
         else:
             self._view(l, self.u.scroll_offset, rows)
         self._footer(c, tot, tv, succ)
-        self.s.noutrefresh()
-        curses.doupdate()
+        self._flush()
         self.pi = self.u.current_index
         self.po = self.u.scroll_offset
         self.pt = tv